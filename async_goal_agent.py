@@ -0,0 +1,304 @@
+from groq import AsyncGroq
+import asyncio
+import time
+import uuid
+from typing import AsyncIterator, List, Dict, Optional
+from config import Config
+from async_tools import AsyncGoalTools
+from async_mongodb_database import AsyncGoalMongoDB
+from prompts import dynamic_prompt_suffix
+from goal_agent import GoalAgent
+from history import HistoryManager, trim_to_turn_start
+from serialization import loads
+from routing import ModelRouter, get_router
+from resilience import AsyncResilientCompletions
+from metrics import MetricsSink, TurnMetrics, chunk_usage, get_sink, track_turn
+import logging
+
+class AsyncGoalAgent:
+    """Non-blocking GoalAgent for serving many conversations on one event loop"""
+    
+    def __init__(self, api_key: str = Config.GROQ_API_KEY, db: AsyncGoalMongoDB = None,
+                 router: ModelRouter = None, session_id: str = None, client: AsyncGroq = None,
+                 user_id: str = 'default', metrics: MetricsSink = None):
+        if not api_key and client is None:
+            raise ValueError("GROQ_API_KEY is required")
+        
+        # Retries are handled by the resilience layer, not the SDK. A server
+        # passes one shared client so idle sessions hold no connections
+        self.client = client or AsyncGroq(api_key=api_key, max_retries=0)
+        self.user_id = user_id
+        # Only named sessions are stored - they are the ones that can resume
+        self._persist = Config.SESSION_PERSIST and session_id is not None
+        self._session_loaded = not self._persist
+        # Rate limit budget is shared across agents and queued fairly per session
+        self.session_id = session_id or uuid.uuid4().hex
+        self.completions = AsyncResilientCompletions(self.client, self.session_id)
+        self.tools = AsyncGoalTools(db)
+        # A shared db (the server's) outlives the agent and is closed by its owner
+        self._owns_db = db is None
+        self.conversation_history = []
+        
+        self.available_functions = {
+            "create_goal": self.tools.create_goal_function,
+            "create_goals_bulk": self.tools.create_goals_bulk_function,
+            "get_goals": self.tools.get_goals_function,
+            "get_goal_details": self.tools.get_goal_details_function,
+            "get_progress_logs": self.tools.get_progress_logs_function,
+            "add_milestone": self.tools.add_milestone_function,
+            "add_milestones_bulk": self.tools.add_milestones_bulk_function,
+            "log_progress": self.tools.log_progress_function,
+            "update_goal": self.tools.update_goal_function,
+            "get_analytics": self.tools.get_analytics_function
+        }
+        self.router = router or get_router()
+        self.metrics = metrics or get_sink()
+        self.history = HistoryManager(
+            summarizer=self._summarize_history if Config.HISTORY_SUMMARIZE else None
+        )
+        
+        # Only the short date suffix is per agent; the prompt body is shared
+        self.prompt_suffix = dynamic_prompt_suffix()
+    
+    async def chat(self, user_message: str) -> str:
+        """Main chat interface - runs tool calls until the model answers"""
+        with track_turn(self.session_id, self.user_id, self.metrics) as turn:
+            return await self._chat(user_message, turn)
+    
+    async def _chat(self, user_message: str, turn: TurnMetrics) -> str:
+        if not self._session_loaded:
+            await self.load_session()
+        
+        self.conversation_history.append({"role": "user", "content": user_message})
+        self.conversation_history = await self.history.acompact(self.conversation_history)
+        # Messages from here on are this turn's, persisted when it ends
+        turn_start = len(self.conversation_history) - 1
+        
+        deadline = time.monotonic() + Config.AGENT_DEADLINE_SECONDS
+        tools_ran = False
+        previous_tools = []
+        
+        try:
+            for step in range(Config.AGENT_MAX_STEPS):
+                # The last step, or running out of time, withholds tools so the
+                # model has to produce its final answer
+                use_tools = step < Config.AGENT_MAX_STEPS - 1 and time.monotonic() < deadline
+                
+                model = self._select_model(user_message, step, use_tools, previous_tools)
+                started = time.perf_counter()
+                response = await self.completions.create(
+                    model=model,
+                    messages=self._build_messages(),
+                    **GoalAgent._tool_params(use_tools),
+                    **Config.GENERATION_PARAMS
+                )
+                turn.record_completion(step, getattr(response, "model", None) or model,
+                                       time.perf_counter() - started, getattr(response, "usage", None))
+                
+                response_message = response.choices[0].message
+                tool_calls = getattr(response_message, 'tool_calls', None) if use_tools else None
+                
+                assistant_message = GoalAgent._assistant_message(
+                    response_message.content,
+                    [
+                        {
+                            "id": tc.id,
+                            "type": tc.type,
+                            "function": {
+                                "name": tc.function.name,
+                                "arguments": tc.function.arguments
+                            }
+                        }
+                        for tc in tool_calls or []
+                    ]
+                )
+                self.conversation_history.append(assistant_message)
+                
+                if "tool_calls" not in assistant_message:
+                    return response_message.content or ""
+                
+                await self._execute_tool_calls(assistant_message["tool_calls"])
+                tools_ran = True
+                previous_tools = [tc["function"]["name"] for tc in assistant_message["tool_calls"]]
+            
+            return ""
+        
+        except Exception as e:
+            logging.error(f"Error in chat: {e}")
+            turn.error = str(e)
+            if tools_ran:
+                return "I processed your request but encountered an issue generating the final response. Please try again."
+            return f"I apologize, but I encountered an error: {str(e)}. Please try again."
+        finally:
+            await self._persist_turn(turn_start)
+    
+    async def chat_stream(self, user_message: str) -> AsyncIterator[str]:
+        """Streaming chat interface - yields content deltas as they arrive"""
+        with track_turn(self.session_id, self.user_id, self.metrics) as turn:
+            # async for does not close the inner generator when this one is
+            # closed (e.g. the client disconnected), so close it here to run
+            # its cleanup inside the turn - contextlib.aclosing, on Python 3.8
+            stream = self._chat_stream(user_message, turn)
+            try:
+                async for delta in stream:
+                    yield delta
+            finally:
+                await stream.aclose()
+    
+    async def _chat_stream(self, user_message: str, turn: TurnMetrics) -> AsyncIterator[str]:
+        if not self._session_loaded:
+            await self.load_session()
+        
+        self.conversation_history.append({"role": "user", "content": user_message})
+        self.conversation_history = await self.history.acompact(self.conversation_history)
+        # Messages from here on are this turn's, persisted when it ends
+        turn_start = len(self.conversation_history) - 1
+        
+        deadline = time.monotonic() + Config.AGENT_DEADLINE_SECONDS
+        tools_ran = False
+        previous_tools = []
+        
+        try:
+            for step in range(Config.AGENT_MAX_STEPS):
+                use_tools = step < Config.AGENT_MAX_STEPS - 1 and time.monotonic() < deadline
+                
+                model = self._select_model(user_message, step, use_tools, previous_tools)
+                started = time.perf_counter()
+                first_token = None
+                usage = None
+                stream = await self.completions.create(
+                    model=model,
+                    messages=self._build_messages(),
+                    stream=True,
+                    **GoalAgent._tool_params(use_tools),
+                    **Config.GENERATION_PARAMS
+                )
+                
+                content_parts = []
+                tool_calls = {}
+                async for chunk in stream:
+                    usage = chunk_usage(chunk) or usage
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta
+                    if delta.content:
+                        if first_token is None:
+                            first_token = time.perf_counter() - started
+                        content_parts.append(delta.content)
+                        yield delta.content
+                    GoalAgent._merge_tool_call_fragments(tool_calls, getattr(delta, 'tool_calls', None))
+                turn.record_completion(step, model, time.perf_counter() - started, usage, first_token)
+                
+                assistant_message = GoalAgent._assistant_message(
+                    "".join(content_parts),
+                    [tool_calls[i] for i in sorted(tool_calls)] if use_tools else []
+                )
+                self.conversation_history.append(assistant_message)
+                
+                if "tool_calls" not in assistant_message:
+                    return
+                
+                await self._execute_tool_calls(assistant_message["tool_calls"])
+                tools_ran = True
+                previous_tools = [tc["function"]["name"] for tc in assistant_message["tool_calls"]]
+        
+        except Exception as e:
+            logging.error(f"Error in chat stream: {e}")
+            turn.error = str(e)
+            if tools_ran:
+                yield "I processed your request but encountered an issue generating the final response. Please try again."
+            else:
+                yield f"I apologize, but I encountered an error: {str(e)}. Please try again."
+        finally:
+            await self._persist_turn(turn_start)
+    
+    _select_model = GoalAgent._select_model
+    system_prompt = GoalAgent.system_prompt
+    _check_owner = GoalAgent._check_owner
+    
+    async def _summarize_history(self, messages: List[Dict]) -> str:
+        """Summarise older conversation turns with the fast model"""
+        response = await self.completions.create(**GoalAgent._summary_request(messages))
+        return response.choices[0].message.content or ""
+    
+    def _build_messages(self) -> List[Dict]:
+        """System prompt followed by the conversation so far"""
+        return [
+            {"role": "system", "content": self.system_prompt}
+        ] + self.conversation_history
+    
+    async def _execute_tool_calls(self, tool_calls: List[Dict]):
+        """Run tool calls concurrently and append their results in call order"""
+        tool_messages = await asyncio.gather(
+            *(self._run_tool_call(tool_call) for tool_call in tool_calls)
+        )
+        
+        self.conversation_history.extend(tool_messages)
+    
+    async def _run_tool_call(self, tool_call: Dict) -> Dict:
+        """Execute a single tool call and build its tool message"""
+        function_name = tool_call["function"]["name"]
+        function_to_call = self.available_functions.get(function_name)
+        
+        if not function_to_call:
+            # Every tool_call_id needs an answer or the next request is rejected
+            return GoalAgent._tool_message(tool_call, GoalAgent._unknown_tool(function_name))
+        
+        started = time.perf_counter()
+        try:
+            function_args = loads(tool_call["function"]["arguments"] or "{}")
+            # Tools always act for the session's user, whatever the model sent
+            function_args["user_id"] = self.user_id
+            function_response = await function_to_call(**function_args)
+        except Exception as e:
+            logging.error(f"Tool execution error: {e}")
+            function_response = {"error": str(e), "success": False}
+        
+        GoalAgent._record_tool(function_name, started, function_response)
+        return GoalAgent._tool_message(tool_call, function_response)
+    
+    async def load_session(self) -> Optional[str]:
+        """Rehydrate the stored conversation; returns the user that owns it, if stored.
+        
+        Raises SessionOwnerError, and keeps raising on every turn, if the
+        session belongs to another user.
+        """
+        if not self._persist:
+            self._session_loaded = True
+            return None
+        
+        stored = await self.tools.db.load_session(self.session_id, self.user_id)
+        if not stored:
+            self._check_owner(await self.tools.db.session_owner(self.session_id))
+            self._session_loaded = True
+            return None
+        self._session_loaded = True
+        self.conversation_history = await self.history.acompact(trim_to_turn_start(stored.get("messages", [])))
+        return stored.get("user_id")
+    
+    async def _persist_turn(self, turn_start: int):
+        """Append this turn's messages to the stored session"""
+        if not self._persist:
+            return
+        try:
+            await self.tools.db.append_session_messages(
+                self.session_id, self.user_id, self.conversation_history[turn_start:]
+            )
+        except Exception as e:
+            logging.error(f"Error saving session {self.session_id}: {e}")
+    
+    async def reset_conversation(self):
+        """Reset conversation history"""
+        self.conversation_history = []
+        if self._persist:
+            await self.tools.db.delete_session(self.session_id, self.user_id)
+        logging.info("Conversation history reset")
+    
+    async def get_user_analytics(self) -> Dict:
+        """Get analytics for the current user"""
+        return await self.tools.get_analytics_function(self.user_id)
+    
+    async def aclose(self):
+        """Close the database connection if this agent opened it"""
+        if self._owns_db:
+            self.tools.db.close()
@@ -0,0 +1,396 @@
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING
+from pymongo.errors import BulkWriteError, ConnectionFailure
+from datetime import datetime
+import asyncio
+from typing import List, Dict, Optional, Any
+from config import Config
+from mongodb_database import GoalMongoDB, client_options
+from serialization import JSON_CODEC_OPTIONS
+import logging
+
+class AsyncGoalMongoDB:
+    """Motor-based counterpart of GoalMongoDB with the same method surface.
+    
+    Reads are not cached, so there is no cache_stats(): every read goes to
+    the server, and the async server overlaps them instead.
+    """
+    
+    def __init__(self, uri: str = Config.MONGO_URI, db_name: str = Config.DB_NAME):
+        # Motor connects lazily - call connect() to verify and create indexes
+        # Motor clients are bound to an event loop, so share one instance
+        # across AsyncGoalTools by passing it in rather than via the registry
+        self.client = AsyncIOMotorClient(uri, **client_options())
+        codec_options = JSON_CODEC_OPTIONS if Config.BSON_JSON_CODEC else None
+        self.db = self.client.get_database(db_name, codec_options=codec_options)
+        
+        # Initialize collections
+        self.goals = self.db['goals']
+        self.milestones = self.db['milestones']
+        self.progress_logs = self.db['progress_logs']
+        # Per-user analytics rollups, keyed by user_id
+        self.user_stats = self.db['user_stats']
+        self.sessions = self.db['sessions']
+    
+    async def connect(self):
+        """Test the connection and create indexes"""
+        try:
+            await self.client.admin.command('ping')
+            await self._create_indexes()
+            if Config.CHECK_QUERY_PLANS:
+                await self.check_query_plans()
+            logging.info("Connected to MongoDB (async) successfully")
+        except ConnectionFailure as e:
+            logging.error(f"Failed to connect to MongoDB: {e}")
+            raise
+    
+    async def _create_indexes(self):
+        """Create the declared indexes and drop the ones they replace"""
+        try:
+            for collection, indexes in GoalMongoDB.INDEXES.items():
+                for keys in indexes:
+                    await self.db[collection].create_index(keys)
+            
+            for collection, names in GoalMongoDB.OBSOLETE_INDEXES.items():
+                existing = set(await self.db[collection].index_information())
+                for name in existing.intersection(names):
+                    await self.db[collection].drop_index(name)
+                    logging.info(f"Dropped redundant index {collection}.{name}")
+        except Exception as e:
+            logging.warning(f"Index creation warning: {e}")
+    
+    async def check_query_plans(self) -> List[str]:
+        """Explain every query shape and warn on collection scans or in-memory sorts"""
+        problems = []
+        for collection, query, sort in GoalMongoDB.QUERY_SHAPES:
+            try:
+                plan = await self.db[collection].find(query).sort(sort).explain()
+            except Exception as e:
+                logging.warning(f"Could not explain {collection} query {query}: {e}")
+                continue
+            
+            problems.extend(GoalMongoDB._plan_problems(collection, query, sort, plan))
+        return problems
+    
+    async def create_goal(self, goal_data: Dict[str, Any]) -> str:
+        """Create a new goal and return its ObjectId as string"""
+        goal_doc = GoalMongoDB._goal_document(goal_data)
+        result = await self.goals.insert_one(goal_doc)
+        await self._update_stats(goal_doc['user_id'], GoalMongoDB._stats_goal_created(goal_doc))
+        return str(result.inserted_id)
+    
+    async def create_goals_bulk(self, goals_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Create many goals in one round trip, reporting a result per item"""
+        results, docs = GoalMongoDB._bulk_documents(goals_data, GoalMongoDB._goal_document)
+        await self._insert_bulk(self.goals, docs, results)
+        
+        increments = {}
+        for index, doc in docs:
+            if "id" in results[index]:
+                user_stats = increments.setdefault(doc['user_id'], {})
+                for field, amount in GoalMongoDB._stats_goal_created(doc).items():
+                    user_stats[field] = user_stats.get(field, 0) + amount
+        
+        for user_id, user_increments in increments.items():
+            await self._update_stats(user_id, user_increments)
+        return results
+    
+    async def get_goals(self, user_id: str = 'default', status: str = 'active',
+                        limit: int = None, view: str = 'detail') -> List[Dict[str, Any]]:
+        """Retrieve goals for a user with the fields of the given view"""
+        try:
+            query = GoalMongoDB._goals_query(user_id, status)
+            cursor = self.goals.find(query, GoalMongoDB.GOAL_VIEWS[view]).sort(GoalMongoDB.GOALS_SORT)
+            
+            if limit:
+                cursor = cursor.limit(limit)
+            
+            goals = [self._serialize_document(doc) async for doc in cursor]
+            
+            # Add milestone counts with a single grouped query instead of one per goal
+            counts = await self._count_milestones([goal['id'] for goal in goals])
+            for goal in goals:
+                goal['milestone_count'] = counts.get(goal['id'], 0)
+            
+            return goals
+        
+        except Exception as e:
+            logging.error(f"Error retrieving goals: {e}")
+            return []
+    
+    async def get_goals_page(self, user_id: str = 'default', status: str = 'active', page_size: int = 20,
+                             cursor: str = None, view: str = 'detail') -> Dict[str, Any]:
+        """One page of a user's goals and the cursor for the next page"""
+        query = GoalMongoDB._goals_query(user_id, status)
+        if cursor:
+            query = {"$and": [query, GoalMongoDB._goals_after(GoalMongoDB._decode_cursor(cursor))]}
+        
+        # Fetch one extra document to learn whether another page exists
+        docs = await self.goals.find(query, GoalMongoDB.GOAL_VIEWS[view]) \
+            .sort(GoalMongoDB.GOALS_SORT).limit(page_size + 1).to_list(None)
+        page = GoalMongoDB._page(docs, page_size, ("priority", "created_date"))
+        
+        counts = await self._count_milestones([goal['id'] for goal in page["goals"]])
+        for goal in page["goals"]:
+            goal['milestone_count'] = counts.get(goal['id'], 0)
+        return page
+    
+    async def _count_milestones(self, goal_ids: List[str]) -> Dict[str, int]:
+        """Count milestones for many goals in one round trip"""
+        if not goal_ids:
+            return {}
+        
+        cursor = self.milestones.aggregate(GoalMongoDB._milestone_count_pipeline(goal_ids))
+        return {item['_id']: item['count'] async for item in cursor}
+    
+    async def get_goal_by_id(self, goal_id: str, user_id: str = None) -> Optional[Dict[str, Any]]:
+        """Get a specific goal by ID, only if it belongs to user_id when given"""
+        try:
+            doc = await self.goals.find_one(GoalMongoDB._goal_filter(goal_id, user_id),
+                                            GoalMongoDB.GOAL_VIEWS["detail"])
+            return self._serialize_document(doc) if doc else None
+        except Exception as e:
+            logging.error(f"Error retrieving goal {goal_id}: {e}")
+            return None
+    
+    async def update_goal(self, goal_id: str, update_data: Dict[str, Any], user_id: str = None) -> bool:
+        """Update a goal, only if it belongs to user_id when given"""
+        try:
+            update_data['updated_date'] = datetime.utcnow()
+            previous = await self.goals.find_one_and_update(
+                GoalMongoDB._goal_filter(goal_id, user_id),
+                {"$set": update_data},
+                projection=GoalMongoDB.STATS_FIELDS
+            )
+            if previous is None:
+                return False
+            
+            await self._update_stats(previous.get('user_id'),
+                                     GoalMongoDB._stats_goal_changed(previous, update_data))
+            return True
+        except Exception as e:
+            logging.error(f"Error updating goal {goal_id}: {e}")
+            return False
+    
+    async def add_milestone(self, goal_id: str, milestone_data: Dict[str, Any], user_id: str = None) -> str:
+        """Add a milestone to a goal"""
+        owner = await self._require_goal(goal_id, user_id)
+        milestone_doc = GoalMongoDB._milestone_document(goal_id, milestone_data)
+        result = await self.milestones.insert_one(milestone_doc)
+        await self._update_stats(owner, {"milestones_total": 1})
+        return str(result.inserted_id)
+    
+    async def add_milestones_bulk(self, goal_id: str, milestones_data: List[Dict[str, Any]],
+                                  user_id: str = None) -> List[Dict[str, Any]]:
+        """Add many milestones to a goal in one round trip, reporting a result per item"""
+        owner = await self._require_goal(goal_id, user_id)
+        results, docs = GoalMongoDB._bulk_documents(
+            milestones_data, lambda data: GoalMongoDB._milestone_document(goal_id, data)
+        )
+        await self._insert_bulk(self.milestones, docs, results)
+        
+        inserted = sum(1 for result in results if "id" in result)
+        if inserted:
+            await self._update_stats(owner, {"milestones_total": inserted})
+        return results
+    
+    @staticmethod
+    async def _insert_bulk(collection, docs: List[tuple], results: List[Dict[str, Any]]):
+        """Unordered insert_many that fills in an id or error for each item"""
+        if not docs:
+            return
+        
+        failed = {}
+        try:
+            await collection.insert_many([doc for _, doc in docs], ordered=False)
+        except BulkWriteError as e:
+            failed = {error['index']: error.get('errmsg', 'Write failed')
+                      for error in e.details.get('writeErrors', [])}
+        
+        GoalMongoDB._record_bulk_results(docs, results, failed)
+    
+    async def get_milestones(self, goal_id: str, user_id: str = None) -> List[Dict[str, Any]]:
+        """Get all milestones for a goal"""
+        if user_id and not await self._goal_owner(goal_id, user_id):
+            return []
+        
+        try:
+            cursor = self.milestones.find(
+                {"goal_id": goal_id}, GoalMongoDB.MILESTONE_PROJECTION
+            ).sort("created_date", ASCENDING)
+            return [self._serialize_document(doc) async for doc in cursor]
+        except Exception as e:
+            logging.error(f"Error retrieving milestones for goal {goal_id}: {e}")
+            return []
+    
+    async def log_progress(self, goal_id: str, entry_type: str, content: str,
+                           metadata: Dict[str, Any] = None, user_id: str = None) -> str:
+        """Log progress for a goal"""
+        owner = await self._require_goal(goal_id, user_id)
+        log_doc = GoalMongoDB._progress_document(goal_id, entry_type, content, metadata)
+        result = await self.progress_logs.insert_one(log_doc)
+        week = GoalMongoDB._week_key(log_doc['timestamp'])
+        await self._update_stats(owner, {f"weekly_progress.{week}": 1})
+        return str(result.inserted_id)
+    
+    async def get_progress_logs(self, goal_id: str, limit: int = 10,
+                                user_id: str = None) -> List[Dict[str, Any]]:
+        """Get progress logs for a goal"""
+        if user_id and not await self._goal_owner(goal_id, user_id):
+            return []
+        
+        try:
+            cursor = self.progress_logs.find(
+                {"goal_id": goal_id}, GoalMongoDB.PROGRESS_PROJECTION
+            ).sort(GoalMongoDB.LOGS_SORT).limit(limit)
+            return [self._serialize_document(doc) async for doc in cursor]
+        except Exception as e:
+            logging.error(f"Error retrieving progress logs: {e}")
+            return []
+    
+    async def get_progress_logs_page(self, goal_id: str, page_size: int = 10,
+                                     cursor: str = None, user_id: str = None) -> Dict[str, Any]:
+        """One page of a goal's progress logs, newest first, and the next cursor"""
+        if user_id:
+            await self._require_goal(goal_id, user_id)
+        
+        query = {"goal_id": goal_id}
+        if cursor:
+            query.update(GoalMongoDB._logs_after(GoalMongoDB._decode_cursor(cursor)))
+        
+        docs = await self.progress_logs.find(query, GoalMongoDB.PROGRESS_PROJECTION) \
+            .sort(GoalMongoDB.LOGS_SORT).limit(page_size + 1).to_list(None)
+        return GoalMongoDB._page(docs, page_size, ("timestamp",), items_key="logs")
+    
+    async def get_goal_details(self, goal_id: str, log_limit: int = 10,
+                               user_id: str = None) -> Optional[Dict[str, Any]]:
+        """Get a goal with its milestones and recent progress logs"""
+        if Config.GOAL_DETAILS_STRATEGY == "concurrent":
+            # Children are only returned once the goal query confirms ownership
+            goal, milestones, progress_logs = await asyncio.gather(
+                self.get_goal_by_id(goal_id, user_id),
+                self.get_milestones(goal_id),
+                self.get_progress_logs(goal_id, log_limit)
+            )
+            if not goal:
+                return None
+            return {"goal": goal, "milestones": milestones, "recent_progress": progress_logs}
+        
+        try:
+            pipeline = GoalMongoDB._goal_details_pipeline(goal_id, log_limit, user_id)
+            docs = await self.goals.aggregate(pipeline).to_list(1)
+            return GoalMongoDB._details_from_document(docs[0]) if docs else None
+        except Exception as e:
+            logging.error(f"Error retrieving details for goal {goal_id}: {e}")
+            return None
+    
+    async def get_goal_analytics(self, user_id: str = 'default') -> Dict[str, Any]:
+        """Get analytics data for user's goals"""
+        try:
+            stats = await self.user_stats.find_one({"_id": user_id}) if Config.ANALYTICS_ROLLUPS else None
+            if Config.ANALYTICS_ROLLUPS and (stats is None or stats.get("rebuilding")):
+                # Writes only increment existing rollups, so build this user's on first read
+                await self.rebuild_user_stats(user_id)
+                # A rebuild leaves no rollup only for a user without goals
+                stats = await self.user_stats.find_one({"_id": user_id}) or {}
+            if stats is not None and not stats.get("rebuilding"):
+                return GoalMongoDB._analytics_from_stats(stats)
+            
+            # No rollup yet - compute from the raw collections
+            pipeline = GoalMongoDB._analytics_pipeline(user_id)
+            facets = await self.goals.aggregate(pipeline).to_list(1)
+            return GoalMongoDB._analytics_from_facets(facets[0] if facets else {})
+        
+        except Exception as e:
+            logging.error(f"Error getting analytics: {e}")
+            return {}
+    
+    async def rebuild_user_stats(self, user_id: str = None) -> int:
+        """Backfill user_stats rollups from the raw collections (see GoalMongoDB)"""
+        attempts = GoalMongoDB.ROLLUP_REBUILD_ATTEMPTS if user_id else 1
+        for _ in range(attempts):
+            user_ids = [user_id] if user_id else await self.goals.distinct("user_id")
+            if not user_ids:
+                return 0
+            await self.user_stats.bulk_write(GoalMongoDB._rollup_claims(user_ids), ordered=False)
+            versions = {doc["_id"]: doc["version"] for doc in await self.user_stats.find(
+                {"_id": {"$in": user_ids}}, {"version": 1}).to_list(None)}
+            
+            goal_query = {"user_id": user_id} if user_id else {}
+            goals = await self.goals.find(goal_query, GoalMongoDB.STATS_FIELDS).to_list(None)
+            stats, owners = GoalMongoDB._goal_stats(goals)
+            
+            child_query = {"goal_id": {"$in": list(owners)}} if user_id else {}
+            GoalMongoDB._add_milestone_stats(stats, owners, await self.milestones.aggregate(
+                GoalMongoDB._milestone_stats_pipeline(child_query)).to_list(None))
+            GoalMongoDB._add_progress_stats(stats, owners, await self.progress_logs.aggregate(
+                GoalMongoDB._progress_stats_pipeline(child_query)).to_list(None))
+            
+            requests = GoalMongoDB._rollup_writes(stats, versions)
+            result = await self.user_stats.bulk_write(requests, ordered=False)
+            if result.matched_count + result.deleted_count == len(requests):
+                break
+            logging.info(f"Writes raced {len(requests) - result.matched_count - result.deleted_count} "
+                         f"analytics rollup rebuilds")
+        
+        logging.info(f"Rebuilt analytics rollups for {result.matched_count} users")
+        return result.matched_count
+    
+    async def _update_stats(self, user_id: Optional[str], increments: Dict[str, Any]):
+        """Apply $inc deltas to a user's analytics rollup, if it exists (see GoalMongoDB)"""
+        if not (Config.ANALYTICS_ROLLUPS and user_id and increments):
+            return
+        
+        try:
+            await self.user_stats.update_one(
+                {"_id": user_id},
+                {"$inc": {**increments, "version": 1}, "$set": {"updated_date": datetime.utcnow()}}
+            )
+        except Exception as e:
+            logging.error(f"Error updating analytics rollup for {user_id}: {e}")
+    
+    async def _goal_owner(self, goal_id: str, user_id: str = None) -> Optional[str]:
+        """user_id of a goal (None if missing or not user_id's)"""
+        try:
+            goal = await self.goals.find_one(GoalMongoDB._goal_filter(goal_id, user_id), {"user_id": 1})
+            return goal.get('user_id') if goal else None
+        except Exception:
+            return None
+    
+    async def _require_goal(self, goal_id: str, user_id: str = None) -> str:
+        """Owner of a goal, raising if it does not exist or belongs to someone else"""
+        owner = await self._goal_owner(goal_id, user_id)
+        if not owner:
+            raise ValueError(f"Goal {goal_id} not found")
+        return owner
+    
+    async def append_session_messages(self, session_id: str, user_id: str, messages: List[Dict[str, Any]]):
+        """Append one turn's messages to a stored conversation"""
+        if messages:
+            await self.sessions.update_one(
+                {"_id": session_id, "user_id": user_id},
+                GoalMongoDB._session_append_update(messages),
+                upsert=True
+            )
+    
+    async def load_session(self, session_id: str, user_id: str,
+                           max_messages: int = Config.SESSION_REHYDRATE_MESSAGES) -> Optional[Dict[str, Any]]:
+        """A stored conversation with only its most recent messages"""
+        return await self.sessions.find_one({"_id": session_id, "user_id": user_id},
+                                            GoalMongoDB._session_projection(max_messages))
+    
+    async def session_owner(self, session_id: str) -> Optional[str]:
+        """The user a stored session belongs to, or None if it is not stored"""
+        stored = await self.sessions.find_one({"_id": session_id}, {"user_id": 1})
+        return stored.get("user_id") if stored else None
+    
+    async def delete_session(self, session_id: str, user_id: str):
+        await self.sessions.delete_one({"_id": session_id, "user_id": user_id})
+    
+    _serialize_document = staticmethod(GoalMongoDB._serialize_document)
+    
+    def close(self):
+        """Close database connection"""
+        if self.client:
+            self.client.close()
+            logging.info("MongoDB connection closed")
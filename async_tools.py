@@ -0,0 +1,151 @@
+from typing import Dict, List
+from async_mongodb_database import AsyncGoalMongoDB
+from config import Config
+from tools import GoalTools
+import logging
+
+class AsyncGoalTools:
+    """Async counterpart of GoalTools backed by AsyncGoalMongoDB"""
+    
+    def __init__(self, db: AsyncGoalMongoDB = None):
+        self.db = db or AsyncGoalMongoDB()
+    
+    async def create_goal_function(self, title: str, description: str = "", category: str = "personal",
+                                   priority: int = 3, target_date: str = "", user_id: str = "default") -> Dict:
+        """Create a new goal with SMART criteria validation"""
+        try:
+            goal_data = self._goal_data(user_id, title, description, category, priority, target_date)
+            goal_id = await self.db.create_goal(goal_data)
+            return {
+                "success": True,
+                "goal_id": goal_id,
+                "message": f"Goal '{title}' created successfully with ID: {goal_id}"
+            }
+        
+        except Exception as e:
+            logging.error(f"Error creating goal: {e}")
+            return {"success": False, "error": str(e)}
+    
+    async def create_goals_bulk_function(self, goals: List[Dict], user_id: str = "default") -> Dict:
+        """Create several goals in one call"""
+        try:
+            goals_data, indexes, errors = self._bulk_items(goals, lambda goal: self._goal_item(goal, user_id))
+            results = await self.db.create_goals_bulk(goals_data)
+            return self._bulk_response(self._merge_bulk_results(results, indexes, errors), "goals")
+        
+        except Exception as e:
+            logging.error(f"Error creating goals: {e}")
+            return {"success": False, "error": str(e)}
+    
+    async def get_goals_function(self, user_id: str = "default", status: str = "active",
+                                 limit: int = None, view: str = "summary", cursor: str = None) -> Dict:
+        """Retrieve one page of the user's goals - "summary" view unless details are requested"""
+        try:
+            if view not in ("summary", "detail"):
+                view = "summary"
+            page_size = self._page_size(limit, Config.GOALS_PAGE_SIZE)
+            page = await self.db.get_goals_page(user_id, status, page_size, cursor, view)
+            return self._page_response(page, "goals")
+        except Exception as e:
+            logging.error(f"Error retrieving goals: {e}")
+            return {"success": False, "error": str(e)}
+    
+    async def get_goal_details_function(self, goal_id: str, user_id: str = "default") -> Dict:
+        """Get detailed information about a specific goal"""
+        try:
+            details = await self.db.get_goal_details(goal_id, log_limit=10, user_id=user_id)
+            if not details:
+                return {"success": False, "message": "Goal not found"}
+            
+            return {"success": True, **details}
+        except Exception as e:
+            logging.error(f"Error getting goal details: {e}")
+            return {"success": False, "error": str(e)}
+    
+    async def get_progress_logs_function(self, goal_id: str, limit: int = None, cursor: str = None,
+                                         user_id: str = "default") -> Dict:
+        """Retrieve one page of a goal's progress logs, newest first"""
+        try:
+            page = await self.db.get_progress_logs_page(
+                goal_id, self._page_size(limit, Config.PROGRESS_PAGE_SIZE), cursor, user_id
+            )
+            return self._page_response(page, "logs")
+        except Exception as e:
+            logging.error(f"Error retrieving progress logs: {e}")
+            return {"success": False, "error": str(e)}
+    
+    async def add_milestone_function(self, goal_id: str, milestone_title: str,
+                                     milestone_description: str = "", due_date: str = "",
+                                     priority: int = 3, user_id: str = "default") -> Dict:
+        """Add a milestone to a goal"""
+        try:
+            milestone_data = self._milestone_data(milestone_title, milestone_description, due_date, priority)
+            milestone_id = await self.db.add_milestone(goal_id, milestone_data, user_id)
+            return {
+                "success": True,
+                "milestone_id": milestone_id,
+                "message": f"Milestone '{milestone_title}' added to goal successfully"
+            }
+        
+        except Exception as e:
+            logging.error(f"Error adding milestone: {e}")
+            return {"success": False, "error": str(e)}
+    
+    async def add_milestones_bulk_function(self, goal_id: str, milestones: List[Dict],
+                                           user_id: str = "default") -> Dict:
+        """Add a whole milestone plan to a goal in one call"""
+        try:
+            milestones_data, indexes, errors = self._bulk_items(milestones, self._milestone_item)
+            results = await self.db.add_milestones_bulk(goal_id, milestones_data, user_id)
+            return self._bulk_response(self._merge_bulk_results(results, indexes, errors), "milestones")
+        
+        except Exception as e:
+            logging.error(f"Error adding milestones: {e}")
+            return {"success": False, "error": str(e)}
+    
+    async def log_progress_function(self, goal_id: str, progress_type: str, content: str,
+                                    metadata: Dict = None, user_id: str = "default") -> Dict:
+        """Log progress for a goal"""
+        try:
+            log_id = await self.db.log_progress(goal_id, progress_type, content, metadata or {}, user_id)
+            return {
+                "success": True,
+                "log_id": log_id,
+                "message": "Progress logged successfully"
+            }
+        except Exception as e:
+            logging.error(f"Error logging progress: {e}")
+            return {"success": False, "error": str(e)}
+    
+    async def update_goal_function(self, goal_id: str, user_id: str = "default", **update_fields) -> Dict:
+        """Update goal fields"""
+        try:
+            success = await self.db.update_goal(goal_id, self._update_data(update_fields), user_id)
+            if success:
+                return {"success": True, "message": "Goal updated successfully"}
+            else:
+                return {"success": False, "message": "Goal not found or no changes made"}
+        
+        except Exception as e:
+            logging.error(f"Error updating goal: {e}")
+            return {"success": False, "error": str(e)}
+    
+    async def get_analytics_function(self, user_id: str = "default") -> Dict:
+        """Get goal analytics for user"""
+        try:
+            analytics = await self.db.get_goal_analytics(user_id)
+            return {"success": True, "analytics": analytics}
+        except Exception as e:
+            logging.error(f"Error getting analytics: {e}")
+            return {"success": False, "error": str(e)}
+    
+    _goal_data = staticmethod(GoalTools._goal_data)
+    _goal_item = staticmethod(GoalTools._goal_item)
+    _milestone_data = staticmethod(GoalTools._milestone_data)
+    _milestone_item = staticmethod(GoalTools._milestone_item)
+    _bulk_items = staticmethod(GoalTools._bulk_items)
+    _merge_bulk_results = staticmethod(GoalTools._merge_bulk_results)
+    _update_data = staticmethod(GoalTools._update_data)
+    _page_size = staticmethod(GoalTools._page_size)
+    _page_response = staticmethod(GoalTools._page_response)
+    _bulk_response = staticmethod(GoalTools._bulk_response)
@@ -0,0 +1 @@
+"""Offline benchmarks for GoalAgent, GoalTools and GoalMongoDB - see bench/run.py"""
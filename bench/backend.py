@@ -0,0 +1,139 @@
+import time
+from typing import Any, List
+from pymongo import DeleteOne, InsertOne, ReplaceOne, UpdateOne
+from pymongo.results import BulkWriteResult
+import mongodb_database
+from metrics import current_turn
+
+# mongomock is optional - only the in-memory backend needs it
+try:
+    import mongomock
+except ImportError:
+    mongomock = None
+
+# Collections emptied between workloads. Documents are deleted rather than
+# the collections dropped, so a real server keeps its indexes.
+COLLECTIONS = ("goals", "milestones", "progress_logs", "user_stats", "sessions")
+
+class CountingCollection:
+    """Collection proxy that records each operation on the turn being measured.
+
+    mongomock has no command monitoring, so this stands in for the
+    CommandListener that metrics.py registers on real clients. Operations
+    are named after the server command they would send. mongomock evaluates
+    find() lazily, so its timings cover building the cursor only - count
+    ops from this backend, take latencies from a real mongod.
+    """
+
+    OPERATIONS = {
+        "find": "find",
+        "find_one": "find",
+        "aggregate": "aggregate",
+        "count_documents": "aggregate",
+        "distinct": "distinct",
+        "insert_one": "insert",
+        "insert_many": "insert",
+        "update_one": "update",
+        "update_many": "update",
+        "replace_one": "update",
+        "delete_one": "delete",
+        "delete_many": "delete",
+        "find_one_and_update": "findAndModify"
+    }
+
+    def __init__(self, collection: Any):
+        self._collection = collection
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._collection, name)
+        command = self.OPERATIONS.get(name)
+        if command is None:
+            return attr
+
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            success = False
+            try:
+                result = attr(*args, **kwargs)
+                success = True
+                return result
+            finally:
+                self._record(command, started, success)
+        return timed
+
+    def bulk_write(self, requests: List[Any], ordered: bool = True, **kwargs):
+        """Apply each operation with its single-document method"""
+        # mongomock's bulk_write rejects arguments newer pymongo passes to its builder
+        started = time.perf_counter()
+        success = False
+        counts = {"nInserted": 0, "nMatched": 0, "nModified": 0, "nRemoved": 0, "nUpserted": 0}
+        upserted = []
+        try:
+            for index, request in enumerate(requests):
+                if isinstance(request, (ReplaceOne, UpdateOne)):
+                    write = (self._collection.replace_one if isinstance(request, ReplaceOne)
+                             else self._collection.update_one)
+                    result = write(request._filter, request._doc, upsert=request._upsert)
+                    counts["nMatched"] += result.matched_count
+                    counts["nModified"] += result.modified_count
+                    if result.upserted_id is not None:
+                        counts["nUpserted"] += 1
+                        upserted.append({"index": index, "_id": result.upserted_id})
+                elif isinstance(request, DeleteOne):
+                    counts["nRemoved"] += self._collection.delete_one(request._filter).deleted_count
+                elif isinstance(request, InsertOne):
+                    self._collection.insert_one(request._doc)
+                    counts["nInserted"] += 1
+                else:
+                    raise NotImplementedError(f"{type(request).__name__} is not supported by the bench backend")
+            success = True
+            return BulkWriteResult({**counts, "upserted": upserted}, True)
+        finally:
+            self._record("bulkWrite", started, success)
+
+    @staticmethod
+    def _record(command: str, started: float, success: bool):
+        turn = current_turn.get()
+        if turn is not None:
+            turn.record_mongo(command, time.perf_counter() - started, success)
+
+class CountingDatabase:
+    """Database proxy handing out CountingCollections"""
+
+    def __init__(self, database: Any):
+        self._database = database
+
+    def __getitem__(self, name: str) -> CountingCollection:
+        return CountingCollection(self._database[name])
+
+    def get_collection(self, name: str, **kwargs) -> CountingCollection:
+        return CountingCollection(self._database.get_collection(name, **kwargs))
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._database, name)
+
+class CountingMongoClient:
+    """In-memory mongomock client whose databases count operations"""
+
+    def __init__(self, uri: str, **options):
+        # Monitoring options mean nothing to mongomock
+        options.pop("event_listeners", None)
+        self._client = mongomock.MongoClient(uri, **options)
+
+    def get_database(self, name: str, **kwargs) -> CountingDatabase:
+        return CountingDatabase(self._client.get_database(name, **kwargs))
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._client, name)
+
+def use_mongomock():
+    """Point every GoalMongoDB created from now on at an in-memory server"""
+    if mongomock is None:
+        raise RuntimeError("The mongomock backend needs 'pip install mongomock' (or use --backend mongod)")
+    mongodb_database.MongoClient = CountingMongoClient
+
+def clear(db: mongodb_database.GoalMongoDB):
+    """Empty the benchmark database and its query cache"""
+    for name in COLLECTIONS:
+        db.db[name].delete_many({})
+    db.cache.clear()
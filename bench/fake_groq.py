@@ -0,0 +1,106 @@
+import itertools
+import random
+import time
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Iterator, List, Union
+from history import estimate_tokens
+from serialization import dumps, loads
+
+# One model step: the final answer text, or the tool calls to make. Tool
+# arguments may be a callable that builds them from the messages so far,
+# for steps that need an id returned by an earlier tool.
+ToolArgs = Union[Dict[str, Any], Callable[[List[Dict]], Dict[str, Any]]]
+Step = Union[str, List[tuple]]
+
+class FakeGroq:
+    """Stand-in for the Groq client that plays scripted turns.
+
+    script maps a user message to its steps. The step to play is the number
+    of assistant messages since that user message, so retries, streaming and
+    resumed sessions all see the same sequence. Unscripted requests (such as
+    history summaries) get a short text answer.
+
+    Each completion sleeps latency seconds plus up to jitter more, drawn from
+    a seeded generator so runs are reproducible.
+    """
+
+    def __init__(self, script: Dict[str, List[Step]], latency: float = 0.0,
+                 jitter: float = 0.0, seed: int = 0):
+        self.api_key = "bench"
+        self.script = script
+        self.latency = latency
+        self.jitter = jitter
+        self.calls = 0
+        self._random = random.Random(seed)
+        self._ids = itertools.count()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model: str, messages: List[Dict], stream: bool = False,
+               tools: List[Dict] = None, **kwargs) -> Any:
+        self.calls += 1
+        step = self._next_step(messages)
+        if not tools and not isinstance(step, str):
+            step = "Done."
+        tool_calls = [] if isinstance(step, str) else [
+            SimpleNamespace(
+                id=f"call_{next(self._ids)}",
+                type="function",
+                function=SimpleNamespace(
+                    name=name,
+                    arguments=dumps(args(messages) if callable(args) else args)
+                )
+            )
+            for name, args in step
+        ]
+        content = step if isinstance(step, str) else None
+        usage = SimpleNamespace(
+            prompt_tokens=estimate_tokens(messages),
+            completion_tokens=len(content or "") // 4 + 10 * len(tool_calls)
+        )
+        usage.total_tokens = usage.prompt_tokens + usage.completion_tokens
+
+        self._sleep()
+        if stream:
+            return self._stream(model, content, tool_calls, usage)
+        return SimpleNamespace(
+            model=model,
+            usage=usage,
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content, tool_calls=tool_calls or None))]
+        )
+
+    def _next_step(self, messages: List[Dict]) -> Step:
+        for index in range(len(messages) - 1, -1, -1):
+            if messages[index]["role"] == "user":
+                steps = self.script.get(messages[index]["content"])
+                if not steps:
+                    break
+                taken = sum(1 for m in messages[index + 1:] if m["role"] == "assistant")
+                return steps[min(taken, len(steps) - 1)]
+        return "Done."
+
+    def _sleep(self):
+        delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay > 0:
+            time.sleep(delay)
+
+    @staticmethod
+    def _stream(model: str, content: str, tool_calls: List[Any], usage: Any) -> Iterator[Any]:
+        """Chunks shaped like Groq's: content words, tool calls, then usage in x_groq"""
+        for word in (content or "").split(" "):
+            yield SimpleNamespace(model=model, x_groq=None, choices=[
+                SimpleNamespace(delta=SimpleNamespace(content=word + " ", tool_calls=None))
+            ])
+        for index, call in enumerate(tool_calls):
+            yield SimpleNamespace(model=model, x_groq=None, choices=[
+                SimpleNamespace(delta=SimpleNamespace(content=None, tool_calls=[
+                    SimpleNamespace(index=index, id=call.id, type=call.type, function=call.function)
+                ]))
+            ])
+        yield SimpleNamespace(model=model, choices=[], x_groq=SimpleNamespace(usage=usage))
+
+def last_tool_result(messages: List[Dict], name: str) -> Dict[str, Any]:
+    """The decoded result of the most recent call to the named tool"""
+    for message in reversed(messages):
+        if message["role"] == "tool" and message.get("name") == name:
+            return loads(message["content"])
+    return {}
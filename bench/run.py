@@ -0,0 +1,217 @@
+"""Replay the demo and synthetic workloads against a scripted Groq client.
+
+    python -m bench.run                          # mongomock, 1k/10k/100k goals
+    python -m bench.run --goals 1000 --turns 500 --llm-latency 0.2 --stream
+    python -m bench.run --backend mongod --json baseline.json
+
+Reports p50/p95/p99 turn latency, agent overhead (turn time minus time in
+completions calls), Mongo ops per turn and the peak memory allocated by a
+turn. Runs are seeded and need no network access.
+"""
+import argparse
+import logging
+import math
+import os
+import platform
+import sys
+import time
+import tracemalloc
+import uuid
+from typing import Any, Dict, List, Optional
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m bench.run", description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", choices=["mongomock", "mongod"], default="mongomock",
+                        help="in-memory mongomock, or the MongoDB at MONGO_URI")
+    parser.add_argument("--db-name", default="goal_agent_bench",
+                        help="database to use (emptied before each workload)")
+    parser.add_argument("--goals", type=int, nargs="*", default=[1000, 10000, 100000],
+                        help="goals per user for each synthetic workload")
+    parser.add_argument("--turns", type=int, default=200, help="turns per synthetic workload")
+    parser.add_argument("--detailed-goals", type=int, default=50,
+                        help="goals seeded with milestones and progress logs")
+    parser.add_argument("--demo-repeat", type=int, default=20,
+                        help="times to replay the run_demo interactions (0 skips them)")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="seconds per completions call")
+    parser.add_argument("--llm-jitter", type=float, default=0.0, help="extra random seconds per call")
+    parser.add_argument("--stream", action="store_true", help="use chat_stream instead of chat")
+    parser.add_argument("--memory-turns", type=int, default=20,
+                        help="turns replayed under tracemalloc for the allocation figures")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the results to this file")
+    return parser.parse_args(argv)
+
+def configure(args: argparse.Namespace):
+    """Environment for an offline run - set before Config is imported"""
+    # The fake client has no rate limits to respect
+    os.environ["GROQ_RPM_LIMIT"] = "0"
+    os.environ["GROQ_TPM_LIMIT"] = "0"
+    os.environ.setdefault("GROQ_API_KEY", "bench")
+    os.environ["DB_NAME"] = args.db_name
+    os.environ["CHECK_QUERY_PLANS"] = "false"
+    if args.backend == "mongomock":
+        # mongomock supports neither the JSON codec options nor the $lookup
+        # sub-pipelines of the default goal details strategy
+        os.environ["BSON_JSON_CODEC"] = "false"
+        os.environ["GOAL_DETAILS_STRATEGY"] = "concurrent"
+
+def percentile(values: List[float], p: float) -> float:
+    """Nearest-rank percentile; 0 for no values"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+def _summary(values: List[float], scale: float = 1.0, digits: int = 2) -> Dict[str, float]:
+    return {
+        "p50": round(percentile(values, 50) * scale, digits),
+        "p95": round(percentile(values, 95) * scale, digits),
+        "p99": round(percentile(values, 99) * scale, digits),
+        "mean": round(sum(values) / len(values) * scale, digits) if values else 0.0,
+        "max": round(max(values) * scale, digits) if values else 0.0
+    }
+
+def play(workload: Any, client: Any, sink: Any, stream: bool,
+         limit: Optional[int] = None, trace_memory: bool = False) -> List[int]:
+    """Run the workload's conversations, one fresh agent each.
+
+    With trace_memory, returns the peak bytes allocated during each turn.
+    """
+    from goal_agent import GoalAgent
+
+    allocations = []
+    played = 0
+    for user_id, messages in workload.conversations:
+        agent = GoalAgent(client=client, session_id=uuid.uuid4().hex, user_id=user_id, metrics=sink)
+        try:
+            for message in messages:
+                if limit is not None and played >= limit:
+                    return allocations
+                if trace_memory:
+                    if hasattr(tracemalloc, "reset_peak"):
+                        before = tracemalloc.get_traced_memory()[0]
+                        tracemalloc.reset_peak()
+                    else:
+                        # Python 3.8: clearing the traces also zeroes the peak
+                        tracemalloc.clear_traces()
+                        before = 0
+                if stream:
+                    for _ in agent.chat_stream(message):
+                        pass
+                else:
+                    agent.chat(message)
+                if trace_memory:
+                    allocations.append(tracemalloc.get_traced_memory()[1] - before)
+                played += 1
+        finally:
+            agent.close()
+    return allocations
+
+def run_workload(workload: Any, db: Any, args: argparse.Namespace) -> Dict[str, Any]:
+    """Seed, replay and measure one workload on an emptied database"""
+    from bench import backend
+    from bench.fake_groq import FakeGroq
+    from metrics import InMemorySink, MetricsSink
+
+    backend.clear(db)
+    started = time.perf_counter()
+    workload.seed(db, args.seed)
+    workload.build(args.seed)
+    seed_seconds = time.perf_counter() - started
+
+    client = FakeGroq(workload.script, args.llm_latency, args.llm_jitter, args.seed)
+    sink = InMemorySink(max_turns=workload.turns)
+    play(workload, client, sink, args.stream)
+    turns = list(sink.turns)
+
+    allocations = []
+    if args.memory_turns:
+        tracemalloc.start()
+        try:
+            allocations = play(workload, client, MetricsSink(), args.stream, limit=args.memory_turns,
+                               trace_memory=True)
+        finally:
+            tracemalloc.stop()
+
+    commands = {}
+    for turn in turns:
+        for op in turn["mongo"]:
+            commands[op["command"]] = commands.get(op["command"], 0) + 1
+
+    return {
+        "workload": workload.name,
+        "goals": workload.goal_count,
+        "turns": len(turns),
+        "errors": sum(1 for turn in turns if turn["error"]),
+        "seed_seconds": round(seed_seconds, 2),
+        "turn_ms": _summary([turn["total_seconds"] for turn in turns], 1000),
+        "overhead_ms": _summary([
+            turn["total_seconds"] - sum(c["seconds"] for c in turn["completions"]) for turn in turns
+        ], 1000),
+        "completions_per_turn": _summary([turn["steps"] for turn in turns]),
+        "mongo_ops_per_turn": _summary([turn["mongo_ops"] for turn in turns]),
+        "mongo_ops_by_command": {
+            command: round(count / len(turns), 2) for command, count in sorted(commands.items())
+        } if turns else {},
+        "alloc_kib_per_turn": _summary(allocations, 1 / 1024, 1)
+    }
+
+def print_results(results: List[Dict[str, Any]]):
+    header = (f"{'workload':<14}{'turns':>6}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+              f"{'ovh p50':>9}{'ops/turn':>10}{'ops p95':>9}{'KiB p50':>9}{'KiB max':>9}")
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(f"{r['workload']:<14}{r['turns']:>6}{r['turn_ms']['p50']:>9}{r['turn_ms']['p95']:>9}"
+              f"{r['turn_ms']['p99']:>9}{r['overhead_ms']['p50']:>9}{r['mongo_ops_per_turn']['mean']:>10}"
+              f"{r['mongo_ops_per_turn']['p95']:>9}{r['alloc_kib_per_turn']['p50']:>9}"
+              f"{r['alloc_kib_per_turn']['max']:>9}")
+    for r in results:
+        ops = ", ".join(f"{command} {count}" for command, count in r["mongo_ops_by_command"].items())
+        errors = f", {r['errors']} errors" if r["errors"] else ""
+        print(f"{r['workload']}: seeded in {r['seed_seconds']}s{errors}; ops per turn: {ops}")
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    configure(args)
+
+    # Imported after configure() - Config reads the environment at import
+    from bench import backend
+    from bench.workloads import SyntheticWorkload, demo_workload
+    from mongodb_database import GoalMongoDB
+    from serialization import dumps
+
+    if args.backend == "mongomock":
+        backend.use_mongomock()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    workloads = [demo_workload(args.demo_repeat)] if args.demo_repeat else []
+    workloads += [
+        SyntheticWorkload(count, args.turns, args.detailed_goals)
+        for count in args.goals if count > 0
+    ]
+
+    results = []
+    for workload in workloads:
+        print(f"Running {workload.name}...", file=sys.stderr)
+        db = GoalMongoDB()
+        try:
+            results.append(run_workload(workload, db, args))
+        finally:
+            db.close()
+
+    print_results(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            f.write(dumps({
+                "backend": args.backend,
+                "stream": args.stream,
+                "llm_latency": args.llm_latency,
+                "llm_jitter": args.llm_jitter,
+                "seed": args.seed,
+                "python": platform.python_version(),
+                "results": results
+            }))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+import random
+from typing import Dict, List, Tuple
+from mongodb_database import GoalMongoDB
+from main import DEMO_INTERACTIONS
+from bench.fake_groq import Step, last_tool_result
+
+CATEGORIES = ["personal", "professional", "health", "financial", "relationships", "learning"]
+STATUSES = ["active"] * 16 + ["completed"] * 3 + ["paused"]
+
+class Workload:
+    """A seeded dataset and the conversations to replay against it.
+
+    Each conversation is (user_id, messages) and is played by a fresh
+    agent; script holds the model steps for every message.
+    """
+
+    def __init__(self, name: str, goal_count: int = 0, detailed_goals: int = 0,
+                 user_id: str = "bench"):
+        self.name = name
+        self.goal_count = goal_count
+        self.detailed_goals = detailed_goals
+        self.user_id = user_id
+        self.conversations: List[Tuple[str, List[str]]] = []
+        self.script: Dict[str, List[Step]] = {}
+        self.goal_ids: List[str] = []
+
+    @property
+    def turns(self) -> int:
+        return sum(len(messages) for _, messages in self.conversations)
+
+    def build(self, seed: int = 0):
+        """Write the conversations once the data is seeded; fixed workloads need nothing"""
+
+    def seed(self, db: GoalMongoDB, seed: int = 0, batch_size: int = 1000):
+        """Create goal_count goals, with milestones and progress on the first detailed_goals"""
+        rng = random.Random(seed)
+        self.goal_ids = []
+        for start in range(0, self.goal_count, batch_size):
+            batch = [
+                {
+                    "user_id": self.user_id,
+                    "title": f"Goal {i}",
+                    "description": f"Synthetic goal {i} for benchmarking",
+                    "category": rng.choice(CATEGORIES),
+                    "priority": rng.randint(1, 5),
+                    "status": rng.choice(STATUSES),
+                    "target_date": f"2027-{rng.randint(1, 12):02d}-01"
+                }
+                for i in range(start, min(start + batch_size, self.goal_count))
+            ]
+            self.goal_ids.extend(result["id"] for result in db.create_goals_bulk(batch) if "id" in result)
+
+        for goal_id in self.goal_ids[:self.detailed_goals]:
+            db.add_milestones_bulk(goal_id, [
+                {"title": f"Milestone {n}", "priority": n + 1} for n in range(3)
+            ], self.user_id)
+            for n in range(5):
+                db.log_progress(goal_id, "update", f"Progress note {n}", {}, self.user_id)
+
+def _first_goal_id(messages: List[Dict]) -> str:
+    goals = last_tool_result(messages, "get_goals").get("goals") or [{}]
+    return goals[0].get("id", "")
+
+def demo_workload(repeat: int = 20) -> Workload:
+    """The run_demo interactions, each repetition as a new user starting empty"""
+    workload = Workload("demo")
+    steps = [
+        [
+            [("create_goal", {
+                "title": "Get a job in AI",
+                "description": "Learn machine learning and land an AI role",
+                "category": "professional",
+                "priority": 5,
+                "target_date": "2027-12-31"
+            })],
+            "I've created your goal to get a job in AI by the end of next year."
+        ],
+        [[("get_goals", {})], "Here are your active goals."],
+        [
+            [("get_goals", {})],
+            [("add_milestones_bulk", lambda messages: {
+                "goal_id": _first_goal_id(messages),
+                "milestones": [
+                    {"title": "Finish a Python course", "priority": 4},
+                    {"title": "Complete an ML specialisation", "priority": 5},
+                    {"title": "Build three portfolio projects", "priority": 4},
+                    {"title": "Apply to ten AI roles", "priority": 3}
+                ]
+            })],
+            "I've added four milestones to your machine learning goal."
+        ],
+        [
+            [("get_goals", {})],
+            [("log_progress", lambda messages: {
+                "goal_id": _first_goal_id(messages),
+                "progress_type": "achievement",
+                "content": "Completed an online course on Python"
+            })],
+            "Logged - great progress on your Python skills!"
+        ],
+        [[("get_analytics", {})], "You have one active goal with four milestones."]
+    ]
+    for message, message_steps in zip(DEMO_INTERACTIONS, steps):
+        workload.script[message] = message_steps
+    workload.conversations = [(f"demo-{n}", list(DEMO_INTERACTIONS)) for n in range(repeat)]
+    return workload
+
+class SyntheticWorkload(Workload):
+    """A weighted mix of reads and writes against goal_count seeded goals.
+
+    Messages name goal ids, so they are built by build() once the goals
+    have been seeded.
+    """
+
+    MIX = {
+        "list": 25, "page": 10, "details": 20, "compare": 5, "logs": 10,
+        "progress": 15, "milestone": 5, "update": 5, "analytics": 5
+    }
+
+    def __init__(self, goal_count: int, turns: int = 200, detailed_goals: int = 50,
+                 turns_per_conversation: int = 10):
+        super().__init__(f"goals-{goal_count}", goal_count, detailed_goals)
+        self.turn_count = turns
+        self.turns_per_conversation = turns_per_conversation
+
+    def build(self, seed: int = 0):
+        rng = random.Random(seed)
+        # Most traffic is on the goals that have milestones and progress
+        hot = self.goal_ids[:self.detailed_goals] or self.goal_ids
+        messages = []
+        for n in range(self.turn_count):
+            kind = rng.choices(list(self.MIX), weights=list(self.MIX.values()))[0]
+            message, steps = self._turn(kind, n, rng.choice(hot), rng.choice(self.goal_ids))
+            self.script[message] = steps
+            messages.append(message)
+
+        self.conversations = [
+            (self.user_id, messages[start:start + self.turns_per_conversation])
+            for start in range(0, len(messages), self.turns_per_conversation)
+        ]
+
+    @staticmethod
+    def _turn(kind: str, n: int, goal_id: str, other_id: str) -> Tuple[str, List[Step]]:
+        """The user message for one turn of the given kind and the model steps answering it"""
+        if kind == "list":
+            return "Show me my goals", [[("get_goals", {})], "Here are your active goals."]
+        if kind == "page":
+            return "Show me more of my goals", [
+                [("get_goals", {})],
+                [("get_goals", lambda messages: {
+                    "cursor": last_tool_result(messages, "get_goals").get("next_cursor")
+                })],
+                "Here are more of your goals."
+            ]
+        if kind == "details":
+            return f"How is goal {goal_id} going?", [
+                [("get_goal_details", {"goal_id": goal_id})], "Here is where that goal stands."
+            ]
+        if kind == "compare":
+            return f"Compare goals {goal_id} and {other_id}", [
+                [("get_goal_details", {"goal_id": goal_id}), ("get_goal_details", {"goal_id": other_id})],
+                "Here is how the two goals compare."
+            ]
+        if kind == "logs":
+            return f"Show the progress history of goal {goal_id}", [
+                [("get_progress_logs", {"goal_id": goal_id})], "Here is the progress history."
+            ]
+        if kind == "progress":
+            return f"Log progress on goal {goal_id}: session {n}", [
+                [("log_progress", {"goal_id": goal_id, "progress_type": "update",
+                                   "content": f"Practice session {n}"})],
+                "Progress logged."
+            ]
+        if kind == "milestone":
+            return f"Add milestone {n} to goal {goal_id}", [
+                [("add_milestone", {"goal_id": goal_id, "milestone_title": f"Checkpoint {n}"})],
+                "Milestone added."
+            ]
+        if kind == "update":
+            return f"Set goal {other_id} to priority {n % 5 + 1}", [
+                [("update_goal", {"goal_id": other_id, "priority": n % 5 + 1})], "Goal updated."
+            ]
+        return "What are my goal analytics?", [[("get_analytics", {})], "Here are your analytics."]
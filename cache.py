@@ -0,0 +1,135 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Optional
+from config import Config
+
+class QueryCache:
+    """In-process LRU cache with a TTL and tag-based invalidation.
+
+    Every entry is stored with a set of tags (e.g. "user:<id>", "goal:<id>")
+    so a write can drop exactly the entries it affects.
+
+    Each invalidation stamps its tags with the next generation. A reader
+    takes generation() before querying and passes it to set(), which skips
+    the store if any of the entry's tags was invalidated meanwhile - the
+    value may predate a write that finished while the query was running.
+    """
+
+    def __init__(self, max_entries: int = Config.CACHE_MAX_ENTRIES,
+                 ttl_seconds: float = Config.CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._tags = {}
+        # Generation at which each tag was last invalidated, oldest first.
+        # Tags dropped from it count as invalidated at _floor.
+        self._invalidated = OrderedDict()
+        self._generation = 0
+        self._floor = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return a copy of the cached value, or None on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] < time.monotonic():
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return copy.deepcopy(entry[0])
+
+    def generation(self) -> int:
+        """Token to take before a query whose result will be passed to set()"""
+        with self._lock:
+            return self._generation
+
+    def set(self, key: Hashable, value: Any, tags: Iterable[str], generation: int = None):
+        """Store a value under key, tagged for invalidation.
+
+        With a generation from generation(), nothing is stored if any tag
+        has been invalidated since.
+        """
+        tags = frozenset(tags)
+        with self._lock:
+            if generation is not None and self._stale(tags, generation):
+                return
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = (copy.deepcopy(value), time.monotonic() + self.ttl_seconds, tags)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, *tags: str):
+        """Drop every entry carrying any of the given tags"""
+        with self._lock:
+            self._generation += 1
+            for tag in tags:
+                for key in list(self._tags.get(tag, ())):
+                    self._remove(key)
+                self._invalidated[tag] = self._generation
+                self._invalidated.move_to_end(tag)
+
+            # Bound the stamps; forgetting one makes older readers skip their store
+            while len(self._invalidated) > self.max_entries:
+                _, self._floor = self._invalidated.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+            self._invalidated.clear()
+            self._generation += 1
+            self._floor = self._generation
+
+    def stats(self) -> Dict[str, int]:
+        """Hit and miss counters and current size"""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+    def _stale(self, tags: frozenset, generation: int) -> bool:
+        if self._floor > generation:
+            return True
+        return any(self._invalidated.get(tag, 0) > generation for tag in tags)
+
+    def _remove(self, key: Hashable):
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+class NullCache(QueryCache):
+    """Cache that never stores anything, used when caching is disabled"""
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        self.misses += 1
+        return None
+
+    def set(self, key: Hashable, value: Any, tags: Iterable[str], generation: int = None):
+        pass
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+def get_cache(uri: str, db_name: str) -> QueryCache:
+    """Process-wide cache for one database, shared by every GoalMongoDB"""
+    with _caches_lock:
+        cache = _caches.get((uri, db_name))
+        if cache is None:
+            cache = QueryCache() if Config.CACHE_ENABLED else NullCache()
+            _caches[(uri, db_name)] = cache
+        return cache
@@ -29,3 +29,91 @@ class Config:
         "max_tokens": 4096,
         "top_p": 0.9
     }
+    
+    # Maximum number of tool calls from one turn executed concurrently
+    TOOL_MAX_WORKERS = int(os.getenv("TOOL_MAX_WORKERS", "8"))
+    
+    # Conversation history budget - older turns are compacted beyond this
+    HISTORY_MAX_TOKENS = int(os.getenv("HISTORY_MAX_TOKENS", "6000"))
+    HISTORY_KEEP_TURNS = int(os.getenv("HISTORY_KEEP_TURNS", "4"))
+    HISTORY_SUMMARIZE = os.getenv("HISTORY_SUMMARIZE", "false").lower() == "true"
+    
+    # System prompt variant: "full" or "compact"
+    PROMPT_VARIANT = os.getenv("PROMPT_VARIANT", "full")
+    
+    # MongoDB connection pool, shared by every agent in the process
+    MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))
+    MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+    MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000"))
+    MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+    
+    # Agent loop limits: completions calls per turn and wall-clock deadline
+    AGENT_MAX_STEPS = int(os.getenv("AGENT_MAX_STEPS", "5"))
+    AGENT_DEADLINE_SECONDS = float(os.getenv("AGENT_DEADLINE_SECONDS", "60"))
+    
+    # Model routing policy: "rules" sends simple lookups, and steps reporting
+    # read-only tool results, to the fast model; "primary" always uses the
+    # primary model
+    MODEL_ROUTING = os.getenv("MODEL_ROUTING", "rules")
+    
+    # Read-through cache for goal reads, invalidated on writes
+    CACHE_ENABLED = os.getenv("CACHE_ENABLED", "true").lower() == "true"
+    CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "1024"))
+    CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", "30"))
+    
+    # Goal detail fetch: "lookup" joins milestones and logs in one aggregation,
+    # "concurrent" runs three queries in parallel where $lookup is slow
+    GOAL_DETAILS_STRATEGY = os.getenv("GOAL_DETAILS_STRATEGY", "lookup")
+    
+    # Serve analytics from per-user rollups maintained on write
+    # (backfill existing data with: python main.py rebuild-stats)
+    ANALYTICS_ROLLUPS = os.getenv("ANALYTICS_ROLLUPS", "true").lower() == "true"
+    
+    # Explain the hot query shapes at startup and warn on COLLSCAN/SORT
+    CHECK_QUERY_PLANS = os.getenv("CHECK_QUERY_PLANS", "true").lower() == "true"
+    
+    # Decode ObjectId and datetime to strings inside the BSON decoder
+    # (turn off for drivers without custom type registry support, e.g. mongomock)
+    BSON_JSON_CODEC = os.getenv("BSON_JSON_CODEC", "true").lower() == "true"
+    
+    # Default page sizes for cursor-paginated goal and progress log listings
+    GOALS_PAGE_SIZE = int(os.getenv("GOALS_PAGE_SIZE", "20"))
+    PROGRESS_PAGE_SIZE = int(os.getenv("PROGRESS_PAGE_SIZE", "10"))
+    # Largest page a tool call may request, whatever limit the model sends
+    MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "50"))
+    
+    # Groq retries: jittered exponential backoff honouring Retry-After, and a
+    # per-model circuit breaker that falls back to the fast model while open
+    GROQ_MAX_RETRIES = int(os.getenv("GROQ_MAX_RETRIES", "3"))
+    GROQ_BACKOFF_BASE = float(os.getenv("GROQ_BACKOFF_BASE", "0.5"))
+    GROQ_BACKOFF_MAX = float(os.getenv("GROQ_BACKOFF_MAX", "8"))
+    GROQ_RETRY_MAX_WAIT = float(os.getenv("GROQ_RETRY_MAX_WAIT", "20"))
+    BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+    BREAKER_RESET_SECONDS = float(os.getenv("BREAKER_RESET_SECONDS", "30"))
+    
+    # Client-side rate limits per Groq model, shared by every agent using the
+    # same API key (0 disables the limit, the default). Set them to your
+    # account's limits; GROQ_TPM_LIMIT must exceed one request, which with
+    # tool schemas is ~12.9k tokens for the full prompt and ~1.7k for compact
+    GROQ_RPM_LIMIT = int(os.getenv("GROQ_RPM_LIMIT", "0"))
+    GROQ_TPM_LIMIT = int(os.getenv("GROQ_TPM_LIMIT", "0"))
+    
+    # Server mode (python main.py serve): one agent session per session id,
+    # evicted after SESSION_IDLE_SECONDS without a turn. Users are taken from
+    # the X-User-Id header, so listen only where the auth proxy can reach
+    SERVER_HOST = os.getenv("SERVER_HOST", "127.0.0.1")
+    SERVER_PORT = int(os.getenv("SERVER_PORT", "8080"))
+    SESSION_IDLE_SECONDS = float(os.getenv("SESSION_IDLE_SECONDS", "1800"))
+    SESSION_SWEEP_SECONDS = float(os.getenv("SESSION_SWEEP_SECONDS", "60"))
+    SERVER_MAX_SESSIONS = int(os.getenv("SERVER_MAX_SESSIONS", "10000"))
+    
+    # Persist conversations to the sessions collection: each turn is appended
+    # with $push (capped at SESSION_MAX_STORED_MESSAGES) and sessions are
+    # rehydrated on first use with their last SESSION_REHYDRATE_MESSAGES
+    SESSION_PERSIST = os.getenv("SESSION_PERSIST", "true").lower() == "true"
+    SESSION_MAX_STORED_MESSAGES = int(os.getenv("SESSION_MAX_STORED_MESSAGES", "200"))
+    SESSION_REHYDRATE_MESSAGES = int(os.getenv("SESSION_REHYDRATE_MESSAGES", "50"))
+    
+    # Per-turn latency and token metrics: logging (one structured line per
+    # turn), prometheus (served at GET /metrics in server mode), memory or none
+    METRICS_SINK = os.getenv("METRICS_SINK", "logging").lower()
@@ -0,0 +1,179 @@
+from typing import List, Dict, Optional, Any, Awaitable, Callable, Union
+from config import Config
+from serialization import dumps, loads
+import logging
+
+# Rough characters-per-token ratio for Llama-family tokenizers
+CHARS_PER_TOKEN = 4
+
+SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+
+def estimate_tokens(messages: List[Dict[str, Any]]) -> int:
+    """Estimate the prompt tokens used by a list of chat messages"""
+    total = 0
+    for message in messages:
+        total += len(message.get("content") or "")
+        for tool_call in message.get("tool_calls") or []:
+            total += len(tool_call["function"]["arguments"] or "")
+        # Per-message overhead for role and separators
+        total += 4 * CHARS_PER_TOKEN
+    return total // CHARS_PER_TOKEN
+
+class HistoryManager:
+    """Keeps conversation history within a token budget.
+
+    The most recent turns are kept verbatim. Tool results in older turns are
+    compacted to short summaries, and if the history is still over budget the
+    oldest turns are summarised (when a summarizer is given) or dropped.
+    compact() calls a plain summarizer; acompact() awaits an async one.
+    """
+
+    def __init__(self, max_tokens: int = Config.HISTORY_MAX_TOKENS,
+                 keep_recent_turns: int = Config.HISTORY_KEEP_TURNS,
+                 summarizer: Optional[Callable[[List[Dict[str, Any]]],
+                                               Union[str, Awaitable[str]]]] = None):
+        self.max_tokens = max_tokens
+        self.keep_recent_turns = keep_recent_turns
+        self.summarizer = summarizer
+
+    def compact(self, history: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Return a copy of history that fits the token budget"""
+        if estimate_tokens(history) <= self.max_tokens:
+            return history
+
+        summary, older, recent = self._plan(history)
+        if self._needs_summary(summary, older, recent):
+            try:
+                summary = self._summary_message(self.summarizer(self._summary_input(summary, older)))
+                older = []
+            except Exception as e:
+                logging.error(f"History summarization error: {e}")
+        return self._assemble(summary, older, recent)
+
+    async def acompact(self, history: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """compact() for agents whose summarizer is a coroutine function"""
+        if estimate_tokens(history) <= self.max_tokens:
+            return history
+
+        summary, older, recent = self._plan(history)
+        if self._needs_summary(summary, older, recent):
+            try:
+                summary = self._summary_message(await self.summarizer(self._summary_input(summary, older)))
+                older = []
+            except Exception as e:
+                logging.error(f"History summarization error: {e}")
+        return self._assemble(summary, older, recent)
+
+    def _plan(self, history: List[Dict[str, Any]]) -> tuple:
+        """Split history into summary, older and recent turns, compacting older tool payloads"""
+        summary, turns = self._split_turns(history)
+        older = turns[:-self.keep_recent_turns] if self.keep_recent_turns else turns
+        recent = turns[len(older):]
+
+        # Compacting tool payloads is cheap and loses little - do it first
+        older = [[self._compact_message(m) for m in turn] for turn in older]
+        return summary, older, recent
+
+    def _needs_summary(self, summary: Optional[Dict[str, Any]],
+                       older: List[List[Dict[str, Any]]], recent: List[List[Dict[str, Any]]]) -> bool:
+        return bool(self.summarizer and older and self._tokens(summary, older, recent) > self.max_tokens)
+
+    def _assemble(self, summary: Optional[Dict[str, Any]],
+                  older: List[List[Dict[str, Any]]], recent: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """Drop the oldest turns still over budget and flatten the rest"""
+        while older and self._tokens(summary, older, recent) > self.max_tokens:
+            older.pop(0)
+
+        compacted = [summary] if summary else []
+        for turn in older + recent:
+            compacted.extend(turn)
+
+        logging.info(f"History compacted to ~{estimate_tokens(compacted)} tokens")
+        return compacted
+
+    @staticmethod
+    def _summary_input(summary: Optional[Dict[str, Any]],
+                       turns: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """The running summary followed by the older turns to fold into it"""
+        messages = [summary] if summary else []
+        for turn in turns:
+            messages.extend(turn)
+        return messages
+
+    @staticmethod
+    def _summary_message(text: str) -> Dict[str, Any]:
+        return {"role": "system", "content": SUMMARY_PREFIX + text}
+
+    @staticmethod
+    def _split_turns(history: List[Dict[str, Any]]) -> tuple:
+        """Split history into an optional leading summary and user-led turns"""
+        summary = None
+        if history and history[0]["role"] == "system" and \
+                history[0].get("content", "").startswith(SUMMARY_PREFIX):
+            summary, history = history[0], history[1:]
+
+        # A turn starts at each user message, so tool calls stay with their results
+        turns = []
+        for message in history:
+            if message["role"] == "user" or not turns:
+                turns.append([])
+            turns[-1].append(message)
+        return summary, turns
+
+    @staticmethod
+    def _tokens(summary: Optional[Dict[str, Any]], *turn_groups) -> int:
+        messages = [summary] if summary else []
+        for turns in turn_groups:
+            for turn in turns:
+                messages.extend(turn)
+        return estimate_tokens(messages)
+
+    @staticmethod
+    def _compact_message(message: Dict[str, Any]) -> Dict[str, Any]:
+        """Replace a tool result payload with a short summary"""
+        if message["role"] != "tool":
+            return message
+
+        return {**message, "content": summarize_tool_result(message.get("content") or "")}
+
+def summarize_tool_result(content: str) -> str:
+    """Reduce a JSON tool result to its status, ids and titles"""
+    try:
+        result = loads(content)
+    except ValueError:
+        return content[:200]
+
+    if not isinstance(result, dict):
+        return content[:200]
+
+    summary = {key: result[key] for key in ("success", "message", "error", "count", "created",
+                                               "failed", "goal_id", "milestone_id", "log_id")
+               if key in result}
+
+    # Summaries are compacted again on later turns, so items that are already
+    # reduced (milestone titles, {"id", "title"} goals) pass through unchanged
+    if isinstance(result.get("goals"), list):
+        summary["goals"] = [_item_summary(g) for g in result["goals"]]
+    if isinstance(result.get("goal"), dict):
+        summary["goal"] = _item_summary(result["goal"])
+    if isinstance(result.get("milestones"), list):
+        summary["milestones"] = [m.get("title") if isinstance(m, dict) else m for m in result["milestones"]]
+
+    return dumps(summary)
+
+def _item_summary(item: Any) -> Any:
+    """id and title of a goal document; anything else is returned as-is"""
+    if not isinstance(item, dict):
+        return item
+    return {"id": item.get("id"), "title": item.get("title")}
+
+def trim_to_turn_start(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Drop leading messages so history starts at a user message.
+
+    A capped slice of stored history can begin mid-turn, and tool results
+    without their assistant tool call are rejected by the API.
+    """
+    for index, message in enumerate(messages):
+        if message.get("role") == "user":
+            return messages[index:]
+    return []
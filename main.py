@@ -15,7 +15,7 @@ logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 
-def main():
+def main(stream: bool = False):
     """Main application entry point"""
     if not Config.GROQ_API_KEY:
         print("❌ Error: GROQ_API_KEY not found in environment variables")
@@ -75,9 +75,15 @@ def main():
                 continue
             
             # Process user input and get response
-            print("\n🤔 Analyzing your request...")
-            response = agent.chat(user_input)
-            print(f"\n🎯 Goal Agent: {response}\n")
+            if stream:
+                print("\n🎯 Goal Agent: ", end="", flush=True)
+                for delta in agent.chat_stream(user_input):
+                    print(delta, end="", flush=True)
+                print("\n")
+            else:
+                print("\n🤔 Analyzing your request...")
+                response = agent.chat(user_input)
+                print(f"\n🎯 Goal Agent: {response}\n")
             print("-" * 50 + "\n")
             
         except KeyboardInterrupt:
@@ -87,10 +93,9 @@ def main():
             logging.error(f"Unexpected error: {e}")
             print(f"\n❌ Unexpected error: {e}")
             print("Let's try that again...\n")
-        # finally:
-        #     # Clean up resources
-        #     if 'agent' in locals():
-        #         agent.close()
+    
+    # Clean up resources
+    agent.close()
 
 def show_help():
     """Display help information"""
@@ -139,6 +144,16 @@ def show_analytics(agent):
                 print("\n🏷️ Category Breakdown:")
                 for item in data['category_breakdown']:
                     print(f"  {item['_id'].title()}: {item['count']} goals")
+            
+            milestones = data.get('milestone_completion', {})
+            if milestones.get('total'):
+                print(f"\n🏁 Milestones: {milestones['completed']}/{milestones['total']} completed "
+                      f"({milestones['completion_rate']:.0%})")
+            
+            if data.get('weekly_progress'):
+                print("\n📅 Weekly Progress Logs:")
+                for item in data['weekly_progress']:
+                    print(f"  {item['week']}: {item['count']} entries")
         else:
             print("❌ Unable to retrieve analytics at this time")
             
@@ -147,22 +162,23 @@ def show_analytics(agent):
     
     print()
 
+# Also replayed by the benchmark suite (bench/workloads.py)
+DEMO_INTERACTIONS = [
+    "I want to learn machine learning and get a job in AI by the end of next year",
+    "Show me my goals",
+    "Help me create milestones for my machine learning goal",
+    "I completed an online course on Python. Log this as progress.",
+    "What are my goal analytics?"
+]
+
 def run_demo():
     """Run a demonstration of the goal agent capabilities"""
     try:
         agent = GoalAgent()
         
-        demo_interactions = [
-            "I want to learn machine learning and get a job in AI by the end of next year",
-            "Show me my goals",
-            "Help me create milestones for my machine learning goal",
-            "I completed an online course on Python. Log this as progress.",
-            "What are my goal analytics?"
-        ]
-        
         print("🎯 Running Goal Agent Demo\n")
         
-        for i, interaction in enumerate(demo_interactions, 1):
+        for i, interaction in enumerate(DEMO_INTERACTIONS, 1):
             print(f"Demo {i}: {interaction}")
             response = agent.chat(interaction)
             print(f"Response: {response}\n")
@@ -174,9 +190,38 @@ def run_demo():
         if 'agent' in locals():
             agent.close()
 
+def rebuild_stats():
+    """Backfill the per-user analytics rollups from the raw collections"""
+    from mongodb_database import GoalMongoDB
+    
+    db = GoalMongoDB()
+    try:
+        print("📊 Rebuilding analytics rollups...")
+        count = db.rebuild_user_stats()
+        print(f"✅ Rebuilt analytics for {count} users")
+    finally:
+        db.close()
+
+def serve():
+    """Run the multi-tenant HTTP/WebSocket server"""
+    from server import run_server
+    
+    if not Config.GROQ_API_KEY:
+        print("❌ Error: GROQ_API_KEY not found in environment variables")
+        sys.exit(1)
+    
+    print(f"🎯 Goal Agent server listening on {Config.SERVER_HOST}:{Config.SERVER_PORT}")
+    run_server()
+
 if __name__ == "__main__":
     # Check command line arguments
     if len(sys.argv) > 1 and sys.argv[1] == "demo":
         run_demo()
+    elif len(sys.argv) > 1 and sys.argv[1] == "rebuild-stats":
+        rebuild_stats()
+    elif len(sys.argv) > 1 and sys.argv[1] == "serve":
+        serve()
+    elif len(sys.argv) > 1 and sys.argv[1] == "stream":
+        main(stream=True)
     else:
         main()
@@ -0,0 +1,229 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+from pymongo import monitoring
+from config import Config
+from serialization import dumps
+import logging
+
+# The turn being measured in the current thread or task. Motor and the
+# agents' executors copy the context, so Mongo commands run on their
+# threads are still attributed to the right turn.
+current_turn: ContextVar[Optional["TurnMetrics"]] = ContextVar("current_turn", default=None)
+
+class TurnMetrics:
+    """Timings and token counts for one agent turn"""
+
+    def __init__(self, session_id: str, user_id: str):
+        self.session_id = session_id
+        self.user_id = user_id
+        self.completions: List[Dict[str, Any]] = []
+        self.tools: List[Dict[str, Any]] = []
+        self.mongo: List[Dict[str, Any]] = []
+        self.error: Optional[str] = None
+        self.total_seconds = 0.0
+        self._started = time.perf_counter()
+        # Tool calls and Mongo commands may be recorded from several threads
+        self._lock = threading.Lock()
+
+    def record_completion(self, step: int, model: str, seconds: float, usage: Any = None,
+                          first_token_seconds: float = None):
+        completion = {
+            "step": step,
+            "model": model,
+            "seconds": round(seconds, 4),
+            "prompt_tokens": getattr(usage, "prompt_tokens", None),
+            "completion_tokens": getattr(usage, "completion_tokens", None)
+        }
+        if first_token_seconds is not None:
+            completion["first_token_seconds"] = round(first_token_seconds, 4)
+        with self._lock:
+            self.completions.append(completion)
+
+    def record_tool(self, name: str, seconds: float, success: bool):
+        with self._lock:
+            self.tools.append({"name": name, "seconds": round(seconds, 4), "success": success})
+
+    def record_mongo(self, command: str, seconds: float, success: bool):
+        with self._lock:
+            self.mongo.append({"command": command, "seconds": round(seconds, 6), "success": success})
+
+    def finish(self):
+        self.total_seconds = time.perf_counter() - self._started
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "session_id": self.session_id,
+                "user_id": self.user_id,
+                "total_seconds": round(self.total_seconds, 4),
+                "steps": len(self.completions),
+                "prompt_tokens": sum(c["prompt_tokens"] or 0 for c in self.completions),
+                "completion_tokens": sum(c["completion_tokens"] or 0 for c in self.completions),
+                "completions": list(self.completions),
+                "tools": list(self.tools),
+                "mongo_ops": len(self.mongo),
+                "mongo_seconds": round(sum(m["seconds"] for m in self.mongo), 6),
+                "mongo": list(self.mongo),
+                "error": self.error
+            }
+
+def chunk_usage(chunk: Any) -> Any:
+    """Token usage carried by a streamed chunk, if any (Groq sends it in x_groq on the last one)"""
+    return getattr(chunk, "usage", None) or getattr(getattr(chunk, "x_groq", None), "usage", None)
+
+class MetricsSink:
+    """Destination for finished turn metrics. Subclass and override emit."""
+
+    def emit(self, turn: Dict[str, Any]):
+        pass
+
+class LoggingSink(MetricsSink):
+    """Writes one structured log line per turn"""
+
+    def emit(self, turn: Dict[str, Any]):
+        logging.info(f"turn_metrics {dumps(turn)}")
+
+class InMemorySink(MetricsSink):
+    """Keeps the most recent turns in memory, for tests and benchmarks"""
+
+    def __init__(self, max_turns: int = 10000):
+        self.turns = deque(maxlen=max_turns)
+
+    def emit(self, turn: Dict[str, Any]):
+        self.turns.append(turn)
+
+    def clear(self):
+        self.turns.clear()
+
+class PrometheusSink(MetricsSink):
+    """Aggregates turns into histograms and counters in Prometheus text format"""
+
+    BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+    HELP = {
+        "goal_agent_turn_seconds": ("histogram", "Wall time of one agent turn"),
+        "goal_agent_completion_seconds": ("histogram", "Latency of one completions call"),
+        "goal_agent_tool_seconds": ("histogram", "Latency of one tool execution"),
+        "goal_agent_mongo_seconds": ("histogram", "Latency of one MongoDB command"),
+        "goal_agent_turns_total": ("counter", "Agent turns by outcome"),
+        "goal_agent_tokens_total": ("counter", "Groq tokens by model and kind")
+    }
+
+    def __init__(self):
+        self._histograms = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def emit(self, turn: Dict[str, Any]):
+        with self._lock:
+            self._observe("goal_agent_turn_seconds", (), turn["total_seconds"])
+            self._inc("goal_agent_turns_total", (("outcome", "error" if turn["error"] else "ok"),))
+            for completion in turn["completions"]:
+                labels = (("model", completion["model"]),)
+                self._observe("goal_agent_completion_seconds", labels, completion["seconds"])
+                for kind in ("prompt", "completion"):
+                    tokens = completion[f"{kind}_tokens"]
+                    if tokens:
+                        self._inc("goal_agent_tokens_total", labels + (("kind", kind),), tokens)
+            for tool in turn["tools"]:
+                self._observe("goal_agent_tool_seconds", (("tool", tool["name"]),), tool["seconds"])
+            for op in turn["mongo"]:
+                self._observe("goal_agent_mongo_seconds", (("command", op["command"]),), op["seconds"])
+
+    def render(self) -> str:
+        """Current values in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            for name, (kind, help_text) in self.HELP.items():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                if kind == "counter":
+                    for (metric, labels), value in self._counters.items():
+                        if metric == name:
+                            lines.append(f"{name}{self._labels(labels)} {value}")
+                    continue
+
+                for (metric, labels), (buckets, total, count) in self._histograms.items():
+                    if metric != name:
+                        continue
+                    for bound, bucket_count in zip(self.BUCKETS, buckets):
+                        lines.append(f"{name}_bucket{self._labels(labels + (('le', str(bound)),))} {bucket_count}")
+                    lines.append(f"{name}_bucket{self._labels(labels + (('le', '+Inf'),))} {count}")
+                    lines.append(f"{name}_sum{self._labels(labels)} {total}")
+                    lines.append(f"{name}_count{self._labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def _observe(self, name: str, labels: tuple, value: float):
+        buckets, total, count = self._histograms.get((name, labels), ([0] * len(self.BUCKETS), 0.0, 0))
+        for index, bound in enumerate(self.BUCKETS):
+            if value <= bound:
+                buckets[index] += 1
+        self._histograms[(name, labels)] = (buckets, total + value, count + 1)
+
+    def _inc(self, name: str, labels: tuple, amount: float = 1):
+        self._counters[(name, labels)] = self._counters.get((name, labels), 0) + amount
+
+    @staticmethod
+    def _labels(labels: tuple) -> str:
+        if not labels:
+            return ""
+        return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+class MongoCommandTimer(monitoring.CommandListener):
+    """Attributes every MongoDB command to the turn that issued it"""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        turn = current_turn.get()
+        if turn is not None:
+            turn.record_mongo(event.command_name, event.duration_micros / 1e6, True)
+
+    def failed(self, event):
+        turn = current_turn.get()
+        if turn is not None:
+            turn.record_mongo(event.command_name, event.duration_micros / 1e6, False)
+
+mongo_command_timer = MongoCommandTimer()
+
+SINKS = {
+    "none": MetricsSink,
+    "logging": LoggingSink,
+    "prometheus": PrometheusSink,
+    "memory": InMemorySink
+}
+
+_sink = None
+_sink_lock = threading.Lock()
+
+def get_sink() -> MetricsSink:
+    """Process-wide sink named in Config.METRICS_SINK"""
+    global _sink
+    with _sink_lock:
+        if _sink is None:
+            _sink = SINKS[Config.METRICS_SINK]()
+        return _sink
+
+@contextmanager
+def track_turn(session_id: str, user_id: str, sink: MetricsSink) -> Iterator[TurnMetrics]:
+    """Measure one turn and emit it to the sink when the turn ends"""
+    turn = TurnMetrics(session_id, user_id)
+    token = current_turn.set(turn)
+    try:
+        yield turn
+    finally:
+        turn.finish()
+        try:
+            current_turn.reset(token)
+        except ValueError:
+            # A stream abandoned mid-turn is closed from another context
+            pass
+        try:
+            sink.emit(turn.to_dict())
+        except Exception as e:
+            logging.error(f"Metrics sink error: {e}")
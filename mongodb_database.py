@@ -1,8 +1,16 @@
-from pymongo import MongoClient, ASCENDING, DESCENDING
-from pymongo.errors import ConnectionFailure
-from datetime import datetime
+from pymongo import MongoClient, DeleteOne, ReplaceOne, UpdateOne, ASCENDING, DESCENDING
+from pymongo.errors import BulkWriteError, ConnectionFailure
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 from typing import List, Dict, Optional, Any
 from config import Config
+from cache import get_cache
+from serialization import JSON_CODEC_OPTIONS, dumps, loads
+from metrics import mongo_command_timer
+import atexit
+import contextvars
+import base64
+import threading
 import logging
 
 # Import ObjectId with fallback for different pymongo versions
@@ -11,210 +19,1115 @@ try:
 except ImportError:
     from pymongo.objectid import ObjectId
 
+def client_options() -> Dict[str, Any]:
+    """Connection pool settings shared by the sync and async clients"""
+    return {
+        "maxPoolSize": Config.MONGO_MAX_POOL_SIZE,
+        "minPoolSize": Config.MONGO_MIN_POOL_SIZE,
+        "maxIdleTimeMS": Config.MONGO_MAX_IDLE_TIME_MS,
+        "serverSelectionTimeoutMS": Config.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        # Times every command for the per-turn metrics
+        "event_listeners": [mongo_command_timer]
+    }
+
+class MongoClientRegistry:
+    """Process-wide MongoClient per URI, shared by every GoalMongoDB.
+    
+    The first acquire connects and pings. Clients then stay open until
+    close_all(), which runs at exit, so agents created one after another
+    (CLI runs, server sessions) reuse the warm pool instead of reconnecting.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clients = {}
+        self._refs = {}
+        self._indexed = set()
+    
+    def acquire(self, uri: str) -> MongoClient:
+        """Return the shared client for uri, connecting on first use"""
+        with self._lock:
+            client = self._clients.get(uri)
+            if client is None:
+                client = MongoClient(uri, **client_options())
+                try:
+                    # Test connection
+                    client.admin.command('ping')
+                except ConnectionFailure:
+                    client.close()
+                    raise
+                self._clients[uri] = client
+                self._refs[uri] = 0
+                logging.info("Connected to MongoDB successfully")
+            self._refs[uri] += 1
+            return client
+    
+    def release(self, uri: str):
+        """Drop one reference to the client for uri; the pool stays open"""
+        with self._lock:
+            if self._refs.get(uri, 0) > 0:
+                self._refs[uri] -= 1
+    
+    def claim_indexes(self, uri: str, db_name: str) -> bool:
+        """True the first time a database is seen, so indexes are built once"""
+        with self._lock:
+            if (uri, db_name) in self._indexed:
+                return False
+            self._indexed.add((uri, db_name))
+            return True
+    
+    def close_all(self):
+        """Close every pooled client"""
+        with self._lock:
+            for client in self._clients.values():
+                client.close()
+            if self._clients:
+                logging.info("MongoDB connections closed")
+            self._clients.clear()
+            self._refs.clear()
+
+client_registry = MongoClientRegistry()
+atexit.register(client_registry.close_all)
+
+# Runs independent reads side by side for the concurrent fetch fallback
+_fetch_executor = ThreadPoolExecutor(max_workers=Config.TOOL_MAX_WORKERS)
+
 class GoalMongoDB:
+    # Sort orders used when listing goals and progress logs; _id breaks ties
+    # so the order is total and keyset cursors are stable
+    GOALS_SORT = [("priority", DESCENDING), ("created_date", DESCENDING), ("_id", DESCENDING)]
+    LOGS_SORT = [("timestamp", DESCENDING), ("_id", DESCENDING)]
+    
+    # Fields returned for each goal view; "summary" is what a goal list needs
+    GOAL_VIEWS = {
+        "summary": {"title": 1, "status": 1, "priority": 1, "category": 1,
+                    "target_date": 1, "progress_percentage": 1, "created_date": 1},
+        "detail": {"metadata": 0}
+    }
+    # Child documents are always read in the context of their goal
+    MILESTONE_PROJECTION = {"goal_id": 0}
+    PROGRESS_PROJECTION = {"goal_id": 0, "metadata": 0}
+    
+    # Times a single user's rollup rebuild is retried when writes race it
+    ROLLUP_REBUILD_ATTEMPTS = 3
+    
+    # Index plan: each index serves the filter and sort of a query shape below
+    INDEXES = {
+        "goals": [
+            # get_goals with a status filter, and the analytics $match on user_id
+            [("user_id", ASCENDING), ("status", ASCENDING)] + GOALS_SORT,
+            # get_goals with status='all'
+            [("user_id", ASCENDING)] + GOALS_SORT
+        ],
+        "milestones": [
+            # get_milestones, milestone counts and the goal details and analytics $lookups
+            [("goal_id", ASCENDING), ("created_date", ASCENDING)]
+        ],
+        "progress_logs": [
+            # get_progress_logs, the goal details $lookup and the analytics
+            # $lookup's timestamp range
+            [("goal_id", ASCENDING)] + LOGS_SORT
+        ]
+    }
+    
+    # Indexes from earlier plans that the ones above make redundant
+    OBSOLETE_INDEXES = {
+        "goals": ["user_id_1_status_1", "created_date_-1",
+                  "user_id_1_status_1_priority_-1_created_date_-1",
+                  "user_id_1_priority_-1_created_date_-1"],
+        "milestones": ["goal_id_1"],
+        "progress_logs": ["goal_id_1_timestamp_-1"]
+    }
+    
+    # (collection, filter, sort) for every hot query, checked with explain()
+    QUERY_SHAPES = [
+        ("goals", {"user_id": "default", "status": "active"}, GOALS_SORT),
+        ("goals", {"user_id": "default"}, GOALS_SORT),
+        ("milestones", {"goal_id": "000000000000000000000000"}, [("created_date", ASCENDING)]),
+        ("progress_logs", {"goal_id": "000000000000000000000000"}, LOGS_SORT)
+    ]
+    
     def __init__(self, uri: str = Config.MONGO_URI, db_name: str = Config.DB_NAME):
         try:
-            self.client = MongoClient(uri, serverSelectionTimeoutMS=5000)
-            # Test connection
-            self.client.admin.command('ping')
-            self.db = self.client[db_name]
+            self.uri = uri
+            self.client = client_registry.acquire(uri)
+            codec_options = JSON_CODEC_OPTIONS if Config.BSON_JSON_CODEC else None
+            self.db = self.client.get_database(db_name, codec_options=codec_options)
             
             # Initialize collections
             self.goals = self.db['goals']
-            self.milestones = self.db['milestones'] 
+            self.milestones = self.db['milestones']
             self.progress_logs = self.db['progress_logs']
+            # Per-user analytics rollups, keyed by user_id
+            self.user_stats = self.db['user_stats']
+            # Conversation histories, keyed by session id
+            self.sessions = self.db['sessions']
             
-            # Create indexes for better performance
-            self._create_indexes()
-            logging.info("Connected to MongoDB successfully")
+            # Read-through cache shared by every instance on this database
+            self.cache = get_cache(uri, db_name)
             
+            # Create indexes for better performance, once per process
+            if client_registry.claim_indexes(uri, db_name):
+                self._create_indexes()
+                if Config.CHECK_QUERY_PLANS:
+                    self.check_query_plans()
+        
         except ConnectionFailure as e:
             logging.error(f"Failed to connect to MongoDB: {e}")
             raise
     
     def _create_indexes(self):
-        """Create database indexes for optimized queries"""
+        """Create the declared indexes and drop the ones they replace"""
         try:
-            self.goals.create_index([("user_id", ASCENDING), ("status", ASCENDING)])
-            self.goals.create_index([("created_date", DESCENDING)])
-            self.milestones.create_index([("goal_id", ASCENDING)])
-            self.progress_logs.create_index([("goal_id", ASCENDING), ("timestamp", DESCENDING)])
+            for collection, indexes in self.INDEXES.items():
+                for keys in indexes:
+                    self.db[collection].create_index(keys)
+            
+            for collection, names in self.OBSOLETE_INDEXES.items():
+                existing = set(self.db[collection].index_information())
+                for name in existing.intersection(names):
+                    self.db[collection].drop_index(name)
+                    logging.info(f"Dropped redundant index {collection}.{name}")
         except Exception as e:
             logging.warning(f"Index creation warning: {e}")
     
+    def check_query_plans(self) -> List[str]:
+        """Explain every query shape and warn on collection scans or in-memory sorts"""
+        problems = []
+        for collection, query, sort in self.QUERY_SHAPES:
+            try:
+                plan = self.db[collection].find(query).sort(sort).explain()
+            except Exception as e:
+                logging.warning(f"Could not explain {collection} query {query}: {e}")
+                continue
+            
+            problems.extend(self._plan_problems(collection, query, sort, plan))
+        return problems
+    
+    @staticmethod
+    def _plan_problems(collection: str, query: Dict[str, Any], sort: List[tuple],
+                       plan: Dict[str, Any]) -> List[str]:
+        """Log and return the COLLSCAN and in-memory SORT stages of one explain() result"""
+        problems = []
+        stages = GoalMongoDB._plan_stages(plan.get("queryPlanner", {}).get("winningPlan", {}))
+        for stage in ("COLLSCAN", "SORT"):
+            if stage in stages:
+                problem = f"{collection} query {list(query)} sorted by {sort} uses {stage}"
+                logging.warning(f"Query plan warning: {problem}")
+                problems.append(problem)
+        return problems
+    
     def create_goal(self, goal_data: Dict[str, Any]) -> str:
         """Create a new goal and return its ObjectId as string"""
-        goal_doc = {
-            "user_id": goal_data.get('user_id', 'default'),
-            "title": goal_data['title'],
-            "description": goal_data.get('description', ''),
-            "category": goal_data.get('category', 'personal'),
-            "priority": goal_data.get('priority', 3),
-            "status": goal_data.get('status', 'active'),
-            "target_date": goal_data.get('target_date'),
-            "created_date": datetime.utcnow(),
-            "updated_date": datetime.utcnow(),
-            "metadata": goal_data.get('metadata', {}),
-            "progress_percentage": 0
-        }
-        
+        goal_doc = self._goal_document(goal_data)
         result = self.goals.insert_one(goal_doc)
+        self._update_stats(goal_doc['user_id'], self._stats_goal_created(goal_doc))
+        self.cache.invalidate(f"goals:{goal_doc['user_id']}", f"analytics:{goal_doc['user_id']}")
         return str(result.inserted_id)
     
-    def get_goals(self, user_id: str = 'default', status: str = 'active', 
-                  limit: int = None) -> List[Dict[str, Any]]:
-        """Retrieve goals for a user"""
+    def create_goals_bulk(self, goals_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Create many goals in one round trip, reporting a result per item"""
+        results, docs = self._bulk_documents(goals_data, self._goal_document)
+        self._insert_bulk(self.goals, docs, results)
+        
+        inserted = [doc for index, doc in docs if "id" in results[index]]
+        increments = {}
+        for doc in inserted:
+            user_stats = increments.setdefault(doc['user_id'], {})
+            for field, amount in self._stats_goal_created(doc).items():
+                user_stats[field] = user_stats.get(field, 0) + amount
+        
+        for user_id, user_increments in increments.items():
+            self._update_stats(user_id, user_increments)
+            self.cache.invalidate(f"goals:{user_id}", f"analytics:{user_id}")
+        return results
+    
+    def get_goals(self, user_id: str = 'default', status: str = 'active',
+                  limit: int = None, view: str = 'detail') -> List[Dict[str, Any]]:
+        """Retrieve goals for a user with the fields of the given view"""
+        cache_key = ("goals", user_id, status, limit, view)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        generation = self.cache.generation()
+        
         try:
-            query = {"user_id": user_id}
-            if status != 'all':
-                query["status"] = status
-            
-            cursor = self.goals.find(query).sort([
-                ("priority", DESCENDING), 
-                ("created_date", DESCENDING)
-            ])
+            cursor = self.goals.find(
+                self._goals_query(user_id, status), self.GOAL_VIEWS[view]
+            ).sort(self.GOALS_SORT)
             
             if limit:
                 cursor = cursor.limit(limit)
-                
-            goals = []
-            for doc in cursor:
-                goal = self._serialize_document(doc)
-                # Add milestone count
-                goal['milestone_count'] = self.milestones.count_documents({"goal_id": goal['id']})
-                goals.append(goal)
-                
-            return goals
             
+            goals = [self._serialize_document(doc) for doc in cursor]
+            
+            # Add milestone counts with a single grouped query instead of one per goal
+            counts = self._count_milestones([goal['id'] for goal in goals])
+            for goal in goals:
+                goal['milestone_count'] = counts.get(goal['id'], 0)
+            
+            self.cache.set(cache_key, goals,
+                           [f"goals:{user_id}"] + [f"goal:{goal['id']}" for goal in goals],
+                           generation=generation)
+            return goals
+        
         except Exception as e:
             logging.error(f"Error retrieving goals: {e}")
             return []
     
-    def get_goal_by_id(self, goal_id: str) -> Optional[Dict[str, Any]]:
-        """Get a specific goal by ID"""
+    def get_goals_page(self, user_id: str = 'default', status: str = 'active', page_size: int = 20,
+                       cursor: str = None, view: str = 'detail') -> Dict[str, Any]:
+        """One page of a user's goals and the cursor for the next page"""
+        cache_key = ("goals_page", user_id, status, page_size, cursor, view)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        generation = self.cache.generation()
+        
+        query = self._goals_query(user_id, status)
+        if cursor:
+            query = {"$and": [query, self._goals_after(self._decode_cursor(cursor))]}
+        
+        # Fetch one extra document to learn whether another page exists
+        docs = list(self.goals.find(query, self.GOAL_VIEWS[view]).sort(self.GOALS_SORT).limit(page_size + 1))
+        page = self._page(docs, page_size, ("priority", "created_date"))
+        
+        counts = self._count_milestones([goal['id'] for goal in page["goals"]])
+        for goal in page["goals"]:
+            goal['milestone_count'] = counts.get(goal['id'], 0)
+        
+        self.cache.set(cache_key, page,
+                       [f"goals:{user_id}"] + [f"goal:{goal['id']}" for goal in page["goals"]],
+                       generation=generation)
+        return page
+    
+    def _count_milestones(self, goal_ids: List[str]) -> Dict[str, int]:
+        """Count milestones for many goals in one round trip"""
+        if not goal_ids:
+            return {}
+        
+        cursor = self.milestones.aggregate(self._milestone_count_pipeline(goal_ids))
+        return {item['_id']: item['count'] for item in cursor}
+    
+    def get_goal_by_id(self, goal_id: str, user_id: str = None) -> Optional[Dict[str, Any]]:
+        """Get a specific goal by ID, only if it belongs to user_id when given"""
+        cache_key = ("goal", goal_id, user_id)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        generation = self.cache.generation()
+        
         try:
-            doc = self.goals.find_one({"_id": ObjectId(goal_id)})
-            return self._serialize_document(doc) if doc else None
+            doc = self.goals.find_one(self._goal_filter(goal_id, user_id), self.GOAL_VIEWS["detail"])
+            if not doc:
+                return None
+            
+            goal = self._serialize_document(doc)
+            self.cache.set(cache_key, goal, [f"goal:{goal_id}"], generation=generation)
+            return goal
         except Exception as e:
             logging.error(f"Error retrieving goal {goal_id}: {e}")
             return None
     
-    def update_goal(self, goal_id: str, update_data: Dict[str, Any]) -> bool:
-        """Update a goal"""
+    def update_goal(self, goal_id: str, update_data: Dict[str, Any], user_id: str = None) -> bool:
+        """Update a goal, only if it belongs to user_id when given"""
         try:
             update_data['updated_date'] = datetime.utcnow()
-            result = self.goals.update_one(
-                {"_id": ObjectId(goal_id)},
-                {"$set": update_data}
+            # updated_date always changes, so a match is a modification; the
+            # previous document tells us which rollups and cached lists to adjust
+            previous = self.goals.find_one_and_update(
+                self._goal_filter(goal_id, user_id),
+                {"$set": update_data},
+                projection=self.STATS_FIELDS
             )
-            return result.modified_count > 0
+            if previous is None:
+                return False
+            
+            self._update_stats(previous.get('user_id'), self._stats_goal_changed(previous, update_data))
+            self.cache.invalidate(f"goal:{goal_id}", f"goals:{previous.get('user_id')}",
+                                  f"analytics:{previous.get('user_id')}")
+            return True
         except Exception as e:
             logging.error(f"Error updating goal {goal_id}: {e}")
             return False
     
-    def add_milestone(self, goal_id: str, milestone_data: Dict[str, Any]) -> str:
+    def add_milestone(self, goal_id: str, milestone_data: Dict[str, Any], user_id: str = None) -> str:
         """Add a milestone to a goal"""
-        milestone_doc = {
-            "goal_id": goal_id,
-            "title": milestone_data['title'],
-            "description": milestone_data.get('description', ''),
-            "due_date": milestone_data.get('due_date'),
-            "completed": False,
-            "completed_date": None,
-            "created_date": datetime.utcnow(),
-            "priority": milestone_data.get('priority', 3)
-        }
-        
-        result = self.milestones.insert_one(milestone_doc)
+        owner = self._require_goal(goal_id, user_id)
+        result = self.milestones.insert_one(self._milestone_document(goal_id, milestone_data))
+        self._update_stats(owner, {"milestones_total": 1})
+        # Goal lists carry milestone counts, so they are tagged by goal too
+        self.cache.invalidate(f"milestones:{goal_id}", f"goal:{goal_id}", f"analytics:{owner}")
         return str(result.inserted_id)
     
-    def get_milestones(self, goal_id: str) -> List[Dict[str, Any]]:
+    def add_milestones_bulk(self, goal_id: str, milestones_data: List[Dict[str, Any]],
+                            user_id: str = None) -> List[Dict[str, Any]]:
+        """Add many milestones to a goal in one round trip, reporting a result per item"""
+        owner = self._require_goal(goal_id, user_id)
+        results, docs = self._bulk_documents(
+            milestones_data, lambda data: self._milestone_document(goal_id, data)
+        )
+        self._insert_bulk(self.milestones, docs, results)
+        
+        inserted = sum(1 for result in results if "id" in result)
+        if inserted:
+            self._update_stats(owner, {"milestones_total": inserted})
+            self.cache.invalidate(f"milestones:{goal_id}", f"goal:{goal_id}", f"analytics:{owner}")
+        return results
+    
+    def get_milestones(self, goal_id: str, user_id: str = None) -> List[Dict[str, Any]]:
         """Get all milestones for a goal"""
+        if user_id and not self._goal_owner(goal_id, user_id):
+            return []
+        
+        cached = self.cache.get(("milestones", goal_id))
+        if cached is not None:
+            return cached
+        
+        generation = self.cache.generation()
+        
         try:
-            cursor = self.milestones.find({"goal_id": goal_id}).sort("created_date", ASCENDING)
-            return [self._serialize_document(doc) for doc in cursor]
+            cursor = self.milestones.find(
+                {"goal_id": goal_id}, self.MILESTONE_PROJECTION
+            ).sort("created_date", ASCENDING)
+            milestones = [self._serialize_document(doc) for doc in cursor]
+            self.cache.set(("milestones", goal_id), milestones, [f"milestones:{goal_id}"], generation=generation)
+            return milestones
         except Exception as e:
             logging.error(f"Error retrieving milestones for goal {goal_id}: {e}")
             return []
     
-    def log_progress(self, goal_id: str, entry_type: str, content: str, 
-                     metadata: Dict[str, Any] = None) -> str:
+    def log_progress(self, goal_id: str, entry_type: str, content: str,
+                     metadata: Dict[str, Any] = None, user_id: str = None) -> str:
         """Log progress for a goal"""
-        log_doc = {
-            "goal_id": goal_id,
-            "entry_type": entry_type,  # 'progress', 'obstacle', 'achievement', 'reflection'
-            "content": content,
-            "timestamp": datetime.utcnow(),
-            "metadata": metadata or {}
-        }
-        
+        owner = self._require_goal(goal_id, user_id)
+        log_doc = self._progress_document(goal_id, entry_type, content, metadata)
         result = self.progress_logs.insert_one(log_doc)
+        self._update_stats(owner, {f"weekly_progress.{self._week_key(log_doc['timestamp'])}": 1})
+        self.cache.invalidate(f"progress:{goal_id}", f"analytics:{owner}")
         return str(result.inserted_id)
     
-    def get_progress_logs(self, goal_id: str, limit: int = 10) -> List[Dict[str, Any]]:
+    def get_progress_logs(self, goal_id: str, limit: int = 10, user_id: str = None) -> List[Dict[str, Any]]:
         """Get progress logs for a goal"""
+        if user_id and not self._goal_owner(goal_id, user_id):
+            return []
+        
+        cached = self.cache.get(("progress", goal_id, limit))
+        if cached is not None:
+            return cached
+        
+        generation = self.cache.generation()
+        
         try:
-            cursor = self.progress_logs.find({"goal_id": goal_id}).sort("timestamp", DESCENDING).limit(limit)
-            return [self._serialize_document(doc) for doc in cursor]
+            cursor = self.progress_logs.find(
+                {"goal_id": goal_id}, self.PROGRESS_PROJECTION
+            ).sort(self.LOGS_SORT).limit(limit)
+            logs = [self._serialize_document(doc) for doc in cursor]
+            self.cache.set(("progress", goal_id, limit), logs, [f"progress:{goal_id}"], generation=generation)
+            return logs
         except Exception as e:
             logging.error(f"Error retrieving progress logs: {e}")
             return []
     
+    def get_progress_logs_page(self, goal_id: str, page_size: int = 10,
+                               cursor: str = None, user_id: str = None) -> Dict[str, Any]:
+        """One page of a goal's progress logs, newest first, and the next cursor"""
+        if user_id:
+            self._require_goal(goal_id, user_id)
+        
+        cache_key = ("progress_page", goal_id, page_size, cursor)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        generation = self.cache.generation()
+        
+        query = {"goal_id": goal_id}
+        if cursor:
+            query.update(self._logs_after(self._decode_cursor(cursor)))
+        
+        docs = list(self.progress_logs.find(query, self.PROGRESS_PROJECTION)
+                    .sort(self.LOGS_SORT).limit(page_size + 1))
+        page = self._page(docs, page_size, ("timestamp",), items_key="logs")
+        
+        self.cache.set(cache_key, page, [f"progress:{goal_id}"], generation=generation)
+        return page
+    
+    def get_goal_details(self, goal_id: str, log_limit: int = 10,
+                         user_id: str = None) -> Optional[Dict[str, Any]]:
+        """Get a goal with its milestones and recent progress logs"""
+        cache_key = ("details", goal_id, log_limit, user_id)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        if Config.GOAL_DETAILS_STRATEGY == "concurrent":
+            return self._get_goal_details_concurrent(goal_id, log_limit, user_id)
+        
+        generation = self.cache.generation()
+        
+        try:
+            docs = list(self.goals.aggregate(self._goal_details_pipeline(goal_id, log_limit, user_id)))
+            if not docs:
+                return None
+            
+            details = self._details_from_document(docs[0])
+            self.cache.set(cache_key, details,
+                           [f"goal:{goal_id}", f"milestones:{goal_id}", f"progress:{goal_id}"],
+                           generation=generation)
+            return details
+        except Exception as e:
+            logging.error(f"Error retrieving details for goal {goal_id}: {e}")
+            return None
+    
+    def _get_goal_details_concurrent(self, goal_id: str, log_limit: int,
+                                     user_id: str = None) -> Optional[Dict[str, Any]]:
+        """Fetch goal, milestones and logs as three parallel queries"""
+        # Children are only returned once the goal query confirms ownership
+        # Each fetch runs in a copy of the caller's context so its Mongo
+        # commands are attributed to the current turn's metrics
+        goal = _fetch_executor.submit(contextvars.copy_context().run, self.get_goal_by_id, goal_id, user_id)
+        milestones = _fetch_executor.submit(contextvars.copy_context().run, self.get_milestones, goal_id)
+        progress_logs = _fetch_executor.submit(contextvars.copy_context().run,
+                                               self.get_progress_logs, goal_id, log_limit)
+        
+        if not goal.result():
+            return None
+        
+        return {
+            "goal": goal.result(),
+            "milestones": milestones.result(),
+            "recent_progress": progress_logs.result()
+        }
+    
     def get_goal_analytics(self, user_id: str = 'default') -> Dict[str, Any]:
         """Get analytics data for user's goals"""
+        cached = self.cache.get(("analytics", user_id))
+        if cached is not None:
+            return cached
+        
+        generation = self.cache.generation()
+        
         try:
-            # Status breakdown
-            pipeline = [
-                {"$match": {"user_id": user_id}},
-                {"$group": {
-                    "_id": "$status",
-                    "count": {"$sum": 1},
-                    "avg_priority": {"$avg": "$priority"}
-                }}
-            ]
-            
-            status_stats = list(self.goals.aggregate(pipeline))
-            
-            # Category breakdown
-            category_pipeline = [
-                {"$match": {"user_id": user_id, "status": "active"}},
-                {"$group": {
-                    "_id": "$category",
-                    "count": {"$sum": 1}
-                }}
-            ]
-            
-            category_stats = list(self.goals.aggregate(category_pipeline))
-            
-            return {
-                "status_breakdown": status_stats,
-                "category_breakdown": category_stats,
-                "total_goals": self.goals.count_documents({"user_id": user_id}),
-                "active_goals": self.goals.count_documents({"user_id": user_id, "status": "active"})
-            }
-            
+            stats = self.user_stats.find_one({"_id": user_id}) if Config.ANALYTICS_ROLLUPS else None
+            if Config.ANALYTICS_ROLLUPS and (stats is None or stats.get("rebuilding")):
+                # Writes only increment existing rollups, so build this user's on first read.
+                # The rebuild invalidates this user's analytics, so re-read after it.
+                self.rebuild_user_stats(user_id)
+                generation = self.cache.generation()
+                # A rebuild leaves no rollup only for a user without goals
+                stats = self.user_stats.find_one({"_id": user_id}) or {}
+            if stats is not None and not stats.get("rebuilding"):
+                analytics = self._analytics_from_stats(stats)
+            else:
+                # No rollup yet - compute from the raw collections
+                facets = next(self.goals.aggregate(self._analytics_pipeline(user_id)), {})
+                analytics = self._analytics_from_facets(facets)
+            self.cache.set(("analytics", user_id), analytics, [f"analytics:{user_id}"], generation=generation)
+            return analytics
+        
         except Exception as e:
             logging.error(f"Error getting analytics: {e}")
             return {}
     
+    # Query and document builders shared with the async database layer
+    
+    @staticmethod
+    def _goal_document(goal_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Build a goal document from tool input"""
+        return {
+            "user_id": goal_data.get('user_id', 'default'),
+            "title": goal_data['title'],
+            "description": goal_data.get('description', ''),
+            "category": goal_data.get('category', 'personal'),
+            "priority": goal_data.get('priority', 3),
+            "status": goal_data.get('status', 'active'),
+            "target_date": goal_data.get('target_date'),
+            "created_date": datetime.utcnow(),
+            "updated_date": datetime.utcnow(),
+            "metadata": goal_data.get('metadata', {}),
+            "progress_percentage": 0
+        }
+    
+    @staticmethod
+    def _milestone_document(goal_id: str, milestone_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Build a milestone document from tool input"""
+        return {
+            "goal_id": goal_id,
+            "title": milestone_data['title'],
+            "description": milestone_data.get('description', ''),
+            "due_date": milestone_data.get('due_date'),
+            "completed": False,
+            "completed_date": None,
+            "created_date": datetime.utcnow(),
+            "priority": milestone_data.get('priority', 3)
+        }
+    
+    @staticmethod
+    def _progress_document(goal_id: str, entry_type: str, content: str,
+                           metadata: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Build a progress log document"""
+        return {
+            "goal_id": goal_id,
+            "entry_type": entry_type,  # 'progress', 'obstacle', 'achievement', 'reflection'
+            "content": content,
+            "timestamp": datetime.utcnow(),
+            "metadata": metadata or {}
+        }
+    
+    @staticmethod
+    def _goal_filter(goal_id: str, user_id: str = None) -> Dict[str, Any]:
+        """Filter for one goal, scoped to its owner when user_id is given"""
+        query = {"_id": ObjectId(goal_id)}
+        if user_id:
+            query["user_id"] = user_id
+        return query
+    
+    @staticmethod
+    def _goals_query(user_id: str, status: str) -> Dict[str, Any]:
+        """Build the filter used to list a user's goals"""
+        query = {"user_id": user_id}
+        if status != 'all':
+            query["status"] = status
+        return query
+    
+    @staticmethod
+    def _encode_cursor(doc: Dict[str, Any], fields: tuple) -> str:
+        """Opaque cursor holding the sort keys of the last document on a page"""
+        values = {field: doc.get(field) for field in fields}
+        values["_id"] = doc["_id"]
+        return base64.urlsafe_b64encode(dumps(values).encode()).decode()
+    
+    @staticmethod
+    def _decode_cursor(token: str) -> Dict[str, Any]:
+        """Sort keys from a cursor, with ids and dates restored to BSON types"""
+        try:
+            values = loads(base64.urlsafe_b64decode(token.encode()))
+            values["_id"] = ObjectId(values["_id"])
+            for field in ("created_date", "timestamp"):
+                if field in values:
+                    values[field] = datetime.fromisoformat(values[field])
+            return values
+        except Exception as e:
+            raise ValueError(f"Invalid cursor: {e}")
+    
+    @staticmethod
+    def _page(docs: List[Dict[str, Any]], page_size: int, fields: tuple,
+              items_key: str = "goals") -> Dict[str, Any]:
+        """Trim the look-ahead document and build the page response"""
+        next_cursor = None
+        if len(docs) > page_size:
+            docs = docs[:page_size]
+            next_cursor = GoalMongoDB._encode_cursor(docs[-1], fields)
+        return {
+            items_key: [GoalMongoDB._serialize_document(doc) for doc in docs],
+            "next_cursor": next_cursor
+        }
+    
+    @staticmethod
+    def _goals_after(last: Dict[str, Any]) -> Dict[str, Any]:
+        """Keyset filter for goals after the last one seen in GOALS_SORT order"""
+        return {"$or": [
+            {"priority": {"$lt": last["priority"]}},
+            {"priority": last["priority"], "created_date": {"$lt": last["created_date"]}},
+            {"priority": last["priority"], "created_date": last["created_date"], "_id": {"$lt": last["_id"]}}
+        ]}
+    
+    @staticmethod
+    def _logs_after(last: Dict[str, Any]) -> Dict[str, Any]:
+        """Keyset filter for progress logs after the last one seen in LOGS_SORT order"""
+        return {"$or": [
+            {"timestamp": {"$lt": last["timestamp"]}},
+            {"timestamp": last["timestamp"], "_id": {"$lt": last["_id"]}}
+        ]}
+    
+    @staticmethod
+    def _milestone_count_pipeline(goal_ids: List[str]) -> List[Dict[str, Any]]:
+        """Pipeline counting milestones per goal for a batch of goals"""
+        return [
+            {"$match": {"goal_id": {"$in": goal_ids}}},
+            {"$group": {"_id": "$goal_id", "count": {"$sum": 1}}}
+        ]
+    
+    @staticmethod
+    def _goal_details_pipeline(goal_id: str, log_limit: int, user_id: str = None) -> List[Dict[str, Any]]:
+        """Pipeline joining a goal with its milestones and latest progress logs"""
+        # Child documents store goal_id as a string, so match it as a literal
+        # rather than via $expr, which keeps the goal_id indexes usable
+        return [
+            {"$match": GoalMongoDB._goal_filter(goal_id, user_id)},
+            {"$project": GoalMongoDB.GOAL_VIEWS["detail"]},
+            {"$lookup": {
+                "from": "milestones",
+                "pipeline": [
+                    {"$match": {"goal_id": goal_id}},
+                    {"$sort": {"created_date": ASCENDING}},
+                    {"$project": GoalMongoDB.MILESTONE_PROJECTION}
+                ],
+                "as": "milestones"
+            }},
+            {"$lookup": {
+                "from": "progress_logs",
+                "pipeline": [
+                    {"$match": {"goal_id": goal_id}},
+                    {"$sort": dict(GoalMongoDB.LOGS_SORT)},
+                    {"$limit": log_limit},
+                    {"$project": GoalMongoDB.PROGRESS_PROJECTION}
+                ],
+                "as": "recent_progress"
+            }}
+        ]
+    
+    @staticmethod
+    def _details_from_document(doc: Dict[str, Any]) -> Dict[str, Any]:
+        """Split a joined goal document into the goal details response shape"""
+        milestones = doc.pop("milestones", [])
+        progress_logs = doc.pop("recent_progress", [])
+        return {
+            "goal": GoalMongoDB._serialize_document(doc),
+            "milestones": [GoalMongoDB._serialize_document(m) for m in milestones],
+            "recent_progress": [GoalMongoDB._serialize_document(p) for p in progress_logs]
+        }
+    
+    @staticmethod
+    def _analytics_pipeline(user_id: str, weeks: int = 12) -> List[Dict[str, Any]]:
+        """Single-pass $facet pipeline computing every analytics figure"""
+        since = datetime.utcnow() - timedelta(weeks=weeks)
+        return [
+            {"$match": {"user_id": user_id}},
+            {"$facet": {
+                # Status breakdown
+                "status_breakdown": [
+                    {"$group": {
+                        "_id": "$status",
+                        "count": {"$sum": 1},
+                        "avg_priority": {"$avg": "$priority"}
+                    }}
+                ],
+                # Category breakdown
+                "category_breakdown": [
+                    {"$match": {"status": "active"}},
+                    {"$group": {
+                        "_id": "$category",
+                        "count": {"$sum": 1}
+                    }}
+                ],
+                "totals": [
+                    {"$group": {
+                        "_id": None,
+                        "total_goals": {"$sum": 1},
+                        "active_goals": {"$sum": {"$cond": [{"$eq": ["$status", "active"]}, 1, 0]}}
+                    }}
+                ],
+                # Children reference goals by string id. Each $lookup reduces a
+                # goal's children inside the sub-pipeline, so no goal ever
+                # carries all of its documents. let/$expr runs on MongoDB 3.6+;
+                # from 5.0 the $expr equality also uses the goal_id indexes
+                "milestones": [
+                    {"$project": {"goal_id": {"$toString": "$_id"}}},
+                    {"$lookup": {
+                        "from": "milestones",
+                        "let": {"goal_id": "$goal_id"},
+                        "pipeline": [
+                            {"$match": {"$expr": {"$eq": ["$goal_id", "$$goal_id"]}}},
+                            {"$group": {
+                                "_id": None,
+                                "total": {"$sum": 1},
+                                "completed": {"$sum": {"$cond": ["$completed", 1, 0]}}
+                            }}
+                        ],
+                        "as": "counts"
+                    }},
+                    {"$unwind": "$counts"},
+                    {"$group": {
+                        "_id": None,
+                        "total": {"$sum": "$counts.total"},
+                        "completed": {"$sum": "$counts.completed"}
+                    }}
+                ],
+                "weekly_progress": [
+                    {"$project": {"goal_id": {"$toString": "$_id"}}},
+                    {"$lookup": {
+                        "from": "progress_logs",
+                        "let": {"goal_id": "$goal_id"},
+                        "pipeline": [
+                            # Ranges over the (goal_id, timestamp) index
+                            {"$match": {
+                                "$expr": {"$eq": ["$goal_id", "$$goal_id"]},
+                                "timestamp": {"$gte": since}
+                            }},
+                            {"$group": {
+                                "_id": {"$dateToString": {"format": "%G-W%V", "date": "$timestamp"}},
+                                "count": {"$sum": 1}
+                            }}
+                        ],
+                        "as": "weeks"
+                    }},
+                    {"$unwind": "$weeks"},
+                    {"$group": {"_id": "$weeks._id", "count": {"$sum": "$weeks.count"}}},
+                    {"$sort": {"_id": ASCENDING}}
+                ]
+            }}
+        ]
+    
+    @staticmethod
+    def _analytics_from_facets(facets: Dict[str, Any]) -> Dict[str, Any]:
+        """Shape the $facet output into the analytics response"""
+        totals = (facets.get("totals") or [{}])[0]
+        milestones = (facets.get("milestones") or [{}])[0]
+        milestone_total = milestones.get("total", 0)
+        milestone_completed = milestones.get("completed", 0)
+        
+        return {
+            "status_breakdown": facets.get("status_breakdown", []),
+            "category_breakdown": facets.get("category_breakdown", []),
+            "total_goals": totals.get("total_goals", 0),
+            "active_goals": totals.get("active_goals", 0),
+            "milestone_completion": {
+                "total": milestone_total,
+                "completed": milestone_completed,
+                "completion_rate": round(milestone_completed / milestone_total, 3) if milestone_total else 0.0
+            },
+            "weekly_progress": [
+                {"week": item["_id"], "count": item["count"]}
+                for item in facets.get("weekly_progress", [])
+            ]
+        }
+    
+    @staticmethod
+    def _plan_stages(plan: Dict[str, Any]) -> List[str]:
+        """Every stage name in an explain() plan tree"""
+        stages = []
+        if plan.get("stage"):
+            stages.append(plan["stage"])
+        # Classic plans nest via inputStage(s); SBE plans wrap them in queryPlan
+        for key in ("inputStage", "queryPlan"):
+            if isinstance(plan.get(key), dict):
+                stages.extend(GoalMongoDB._plan_stages(plan[key]))
+        for child in plan.get("inputStages", []):
+            stages.extend(GoalMongoDB._plan_stages(child))
+        return stages
+    
+    # Goal fields the analytics rollups depend on
+    STATS_FIELDS = {"user_id": 1, "status": 1, "category": 1, "priority": 1}
+    
+    @staticmethod
+    def _stat_key(value: Any) -> str:
+        """Make a status or category usable as a rollup field name"""
+        return str(value).replace('.', '_').replace('$', '_') if value else 'none'
+    
+    @staticmethod
+    def _week_key(timestamp: datetime) -> str:
+        """ISO week label matching $dateToString's %G-W%V"""
+        year, week, _ = timestamp.isocalendar()
+        return f"{year}-W{week:02d}"
+    
+    @staticmethod
+    def _add_stat(stats: Dict[str, Any], field: str, amount: Any):
+        """Add to a dotted field of a rollup being built in memory"""
+        *parents, leaf = field.split('.')
+        for parent in parents:
+            stats = stats.setdefault(parent, {})
+        stats[leaf] = stats.get(leaf, 0) + amount
+    
+    @classmethod
+    def _goal_stats(cls, goals) -> tuple:
+        """Rollups from goal documents, and the owner of each goal id"""
+        stats = {}
+        owners = {}
+        for goal in goals:
+            owners[str(goal['_id'])] = goal['user_id']
+            user_stats = stats.setdefault(goal['user_id'], {})
+            for field, amount in cls._stats_goal_created(goal).items():
+                cls._add_stat(user_stats, field, amount)
+        return stats, owners
+    
+    @classmethod
+    def _add_milestone_stats(cls, stats: Dict[str, Dict], owners: Dict[str, str], items):
+        """Add _milestone_stats_pipeline results to the owners' rollups"""
+        for item in items:
+            owner = owners.get(item['_id'])
+            if owner:
+                cls._add_stat(stats[owner], "milestones_total", item['total'])
+                cls._add_stat(stats[owner], "milestones_completed", item['completed'])
+    
+    @classmethod
+    def _add_progress_stats(cls, stats: Dict[str, Dict], owners: Dict[str, str], items):
+        """Add _progress_stats_pipeline results to the owners' rollups"""
+        for item in items:
+            owner = owners.get(item['_id']['goal_id'])
+            if owner:
+                cls._add_stat(stats[owner], f"weekly_progress.{item['_id']['week']}", item['count'])
+    
+    @staticmethod
+    def _rollup_claims(user_ids: List[str]) -> List[UpdateOne]:
+        """Placeholder rollups for users without one, so writes during a rebuild bump a version"""
+        return [
+            UpdateOne({"_id": user_id}, {"$setOnInsert": {"rebuilding": True}, "$max": {"version": 0}},
+                      upsert=True)
+            for user_id in user_ids
+        ]
+    
+    @staticmethod
+    def _rollup_writes(stats: Dict[str, Dict], versions: Dict[str, int]) -> List[Any]:
+        """Replace each claimed rollup, unless a write changed its version since it was claimed"""
+        now = datetime.utcnow()
+        return [
+            ReplaceOne({"_id": owner, "version": version},
+                       {**stats[owner], "version": version, "updated_date": now})
+            if owner in stats else DeleteOne({"_id": owner, "version": version})
+            for owner, version in versions.items()
+        ]
+    
+    @staticmethod
+    def _stats_goal_created(goal: Dict[str, Any]) -> Dict[str, Any]:
+        """Rollup increments for a new goal"""
+        status = GoalMongoDB._stat_key(goal.get('status'))
+        increments = {
+            "total_goals": 1,
+            f"status_counts.{status}": 1,
+            f"status_priority_sums.{status}": goal.get('priority') or 0
+        }
+        if goal.get('status') == 'active':
+            increments[f"active_category_counts.{GoalMongoDB._stat_key(goal.get('category'))}"] = 1
+        return increments
+    
+    @staticmethod
+    def _stats_goal_changed(previous: Dict[str, Any], update_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Rollup increments moving a goal from its previous to its updated state"""
+        current = {**previous, **{k: v for k, v in update_data.items() if k in GoalMongoDB.STATS_FIELDS}}
+        increments = {}
+        
+        for field, amount in GoalMongoDB._stats_goal_created(previous).items():
+            increments[field] = increments.get(field, 0) - amount
+        for field, amount in GoalMongoDB._stats_goal_created(current).items():
+            increments[field] = increments.get(field, 0) + amount
+        
+        return {field: amount for field, amount in increments.items() if amount}
+    
+    @staticmethod
+    def _milestone_stats_pipeline(query: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Milestone totals per goal for rebuilding rollups"""
+        return [
+            {"$match": query},
+            {"$group": {
+                "_id": "$goal_id",
+                "total": {"$sum": 1},
+                "completed": {"$sum": {"$cond": ["$completed", 1, 0]}}
+            }}
+        ]
+    
+    @staticmethod
+    def _progress_stats_pipeline(query: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Progress log counts per goal and ISO week for rebuilding rollups"""
+        return [
+            {"$match": query},
+            {"$group": {
+                "_id": {
+                    "goal_id": "$goal_id",
+                    "week": {"$dateToString": {"format": "%G-W%V", "date": "$timestamp"}}
+                },
+                "count": {"$sum": 1}
+            }}
+        ]
+    
+    @staticmethod
+    def _analytics_from_stats(stats: Dict[str, Any], weeks: int = 12) -> Dict[str, Any]:
+        """Shape a user_stats rollup into the analytics response"""
+        status_counts = stats.get("status_counts", {})
+        priority_sums = stats.get("status_priority_sums", {})
+        milestone_total = stats.get("milestones_total", 0)
+        milestone_completed = stats.get("milestones_completed", 0)
+        first_week = GoalMongoDB._week_key(datetime.utcnow() - timedelta(weeks=weeks))
+        
+        return {
+            "status_breakdown": [
+                {"_id": status, "count": count, "avg_priority": priority_sums.get(status, 0) / count}
+                for status, count in status_counts.items() if count > 0
+            ],
+            "category_breakdown": [
+                {"_id": category, "count": count}
+                for category, count in stats.get("active_category_counts", {}).items() if count > 0
+            ],
+            "total_goals": stats.get("total_goals", 0),
+            "active_goals": status_counts.get("active", 0),
+            "milestone_completion": {
+                "total": milestone_total,
+                "completed": milestone_completed,
+                "completion_rate": round(milestone_completed / milestone_total, 3) if milestone_total else 0.0
+            },
+            "weekly_progress": [
+                {"week": week, "count": count}
+                for week, count in sorted(stats.get("weekly_progress", {}).items()) if week >= first_week
+            ]
+        }
+    
     @staticmethod
     def _serialize_document(doc: Dict[str, Any]) -> Dict[str, Any]:
-        """Convert MongoDB document to serializable format"""
+        """Expose _id as id on a freshly decoded document.
+        
+        ObjectId and datetime values are already strings when BSON_JSON_CODEC
+        is on; otherwise serialization.dumps converts them when encoding.
+        """
         if not doc:
             return {}
-            
-        doc = doc.copy()
-        doc['id'] = str(doc.pop('_id'))
         
-        # Convert datetime objects to ISO strings
-        for key, value in doc.items():
-            if isinstance(value, datetime):
-                doc[key] = value.isoformat()
-                
+        doc['id'] = str(doc.pop('_id'))
         return doc
     
-    # def close(self):
-    #     """Close database connection"""
-    #     if self.client:
-    #         self.client.close()
-    #         logging.info("MongoDB connection closed")
+    def rebuild_user_stats(self, user_id: str = None) -> int:
+        """Backfill user_stats rollups from the raw collections.
+        
+        Rebuilds one user, or every user when user_id is None, and returns
+        the number of rollups written. Each rollup is claimed first and only
+        replaced if no write bumped its version while the raw collections
+        were read. A single user is retried when that happens; a rollup
+        that still loses keeps its placeholder, which reads ignore.
+        """
+        attempts = self.ROLLUP_REBUILD_ATTEMPTS if user_id else 1
+        for _ in range(attempts):
+            user_ids = [user_id] if user_id else self.goals.distinct("user_id")
+            if not user_ids:
+                return 0
+            self.user_stats.bulk_write(self._rollup_claims(user_ids), ordered=False)
+            versions = {doc["_id"]: doc["version"] for doc in
+                        self.user_stats.find({"_id": {"$in": user_ids}}, {"version": 1})}
+            
+            goal_query = {"user_id": user_id} if user_id else {}
+            stats, owners = self._goal_stats(self.goals.find(goal_query, self.STATS_FIELDS))
+            
+            child_query = {"goal_id": {"$in": list(owners)}} if user_id else {}
+            self._add_milestone_stats(stats, owners, self.milestones.aggregate(self._milestone_stats_pipeline(child_query)))
+            self._add_progress_stats(stats, owners, self.progress_logs.aggregate(self._progress_stats_pipeline(child_query)))
+            
+            requests = self._rollup_writes(stats, versions)
+            result = self.user_stats.bulk_write(requests, ordered=False)
+            for owner in versions:
+                self.cache.invalidate(f"analytics:{owner}")
+            if result.matched_count + result.deleted_count == len(requests):
+                break
+            logging.info(f"Writes raced {len(requests) - result.matched_count - result.deleted_count} "
+                         f"analytics rollup rebuilds")
+        
+        logging.info(f"Rebuilt analytics rollups for {result.matched_count} users")
+        return result.matched_count
+    
+    def _update_stats(self, user_id: Optional[str], increments: Dict[str, Any]):
+        """Apply $inc deltas to a user's analytics rollup, if it exists.
+        
+        Upserting here would create a rollup holding only this write for
+        users whose data predates rollups; missing rollups are rebuilt from
+        the raw collections when analytics are next read instead. Every
+        write bumps the rollup's version so a rebuild running meanwhile
+        knows its snapshot is stale.
+        """
+        if not (Config.ANALYTICS_ROLLUPS and user_id and increments):
+            return
+        
+        try:
+            self.user_stats.update_one(
+                {"_id": user_id},
+                {"$inc": {**increments, "version": 1}, "$set": {"updated_date": datetime.utcnow()}}
+            )
+        except Exception as e:
+            logging.error(f"Error updating analytics rollup for {user_id}: {e}")
+    
+    @staticmethod
+    def _bulk_documents(items: List[Dict[str, Any]], build) -> tuple:
+        """Build documents for a bulk insert, recording items that fail to build"""
+        results = []
+        docs = []
+        for index, item in enumerate(items):
+            try:
+                docs.append((index, build(item)))
+                results.append({"index": index})
+            except Exception as e:
+                results.append({"index": index, "error": f"Invalid item: {e}"})
+        return results, docs
+    
+    @staticmethod
+    def _insert_bulk(collection, docs: List[tuple], results: List[Dict[str, Any]]):
+        """Unordered insert_many that fills in an id or error for each item"""
+        if not docs:
+            return
+        
+        failed = {}
+        try:
+            collection.insert_many([doc for _, doc in docs], ordered=False)
+        except BulkWriteError as e:
+            # writeErrors index into the submitted documents, not the input items
+            failed = {error['index']: error.get('errmsg', 'Write failed')
+                      for error in e.details.get('writeErrors', [])}
+        
+        GoalMongoDB._record_bulk_results(docs, results, failed)
+    
+    @staticmethod
+    def _record_bulk_results(docs: List[tuple], results: List[Dict[str, Any]], failed: Dict[int, str]):
+        for position, (index, doc) in enumerate(docs):
+            if position in failed:
+                results[index]["error"] = failed[position]
+            else:
+                # insert_many assigns _id to each document before sending
+                results[index]["id"] = str(doc['_id'])
+    
+    def _goal_owner(self, goal_id: str, user_id: str = None) -> Optional[str]:
+        """user_id of a goal (None if missing or not user_id's), served from the cache when possible"""
+        goal = self.get_goal_by_id(goal_id, user_id)
+        return goal.get('user_id') if goal else None
+    
+    def _require_goal(self, goal_id: str, user_id: str = None) -> str:
+        """Owner of a goal, raising if it does not exist or belongs to someone else"""
+        owner = self._goal_owner(goal_id, user_id)
+        if not owner:
+            raise ValueError(f"Goal {goal_id} not found")
+        return owner
+    
+    def append_session_messages(self, session_id: str, user_id: str, messages: List[Dict[str, Any]]):
+        """Append one turn's messages to a stored conversation"""
+        if messages:
+            self.sessions.update_one(
+                {"_id": session_id, "user_id": user_id},
+                self._session_append_update(messages),
+                upsert=True
+            )
+    
+    def load_session(self, session_id: str, user_id: str,
+                     max_messages: int = Config.SESSION_REHYDRATE_MESSAGES) -> Optional[Dict[str, Any]]:
+        """user_id's stored conversation with only its most recent messages"""
+        return self.sessions.find_one({"_id": session_id, "user_id": user_id},
+                                      self._session_projection(max_messages))
+    
+    def session_owner(self, session_id: str) -> Optional[str]:
+        """The user a stored session belongs to, or None if it is not stored"""
+        stored = self.sessions.find_one({"_id": session_id}, {"user_id": 1})
+        return stored.get("user_id") if stored else None
+    
+    def delete_session(self, session_id: str, user_id: str):
+        self.sessions.delete_one({"_id": session_id, "user_id": user_id})
+    
+    @staticmethod
+    def _session_append_update(messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """$push the new messages only, capping what is stored per session"""
+        now = datetime.utcnow()
+        return {
+            "$push": {"messages": {"$each": messages, "$slice": -Config.SESSION_MAX_STORED_MESSAGES}},
+            "$set": {"updated_date": now},
+            "$setOnInsert": {"created_date": now}
+        }
+    
+    @staticmethod
+    def _session_projection(max_messages: int) -> Dict[str, Any]:
+        return {"user_id": 1, "messages": {"$slice": -max_messages}}
+    
+    def cache_stats(self) -> Dict[str, int]:
+        """Read cache hit and miss counters"""
+        return self.cache.stats()
+    
+    def close(self):
+        """Release this instance's reference to the shared connection pool"""
+        if self.client:
+            client_registry.release(self.uri)
+            self.client = None
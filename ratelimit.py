@@ -0,0 +1,211 @@
+import asyncio
+import itertools
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Dict, List, Optional
+from config import Config
+from history import estimate_tokens, CHARS_PER_TOKEN
+from serialization import dumps
+import logging
+
+class RequestTooLargeError(ValueError):
+    """Raised for a request estimated to need more tokens than the TPM limit allows"""
+
+class TokenBucket:
+    """Token bucket refilled continuously at rate_per_minute up to capacity.
+
+    The level may go negative when a request turns out to cost more than
+    its estimate; later requests then wait for the debt to refill.
+    """
+
+    def __init__(self, rate_per_minute: float):
+        self.capacity = float(rate_per_minute)
+        self.rate = rate_per_minute / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until amount can be taken (after refill)"""
+        # A request larger than the whole bucket waits for a full bucket
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def take(self, amount: float):
+        self.level -= min(amount, self.capacity)
+
+class RequestScheduler:
+    """Shared request and token budget for one Groq API key and model.
+
+    Callers queue per session and are granted in round-robin order across
+    sessions, so one busy conversation cannot starve the others. Each grant
+    takes one request from the RPM bucket and the estimated prompt tokens
+    from the TPM bucket; reconcile() corrects the estimate once the actual
+    usage is known.
+    """
+
+    # Upper bound on a single wait so queued callers re-check promptly
+    MAX_POLL_SECONDS = 0.25
+
+    def __init__(self, rpm: int = Config.GROQ_RPM_LIMIT, tpm: int = Config.GROQ_TPM_LIMIT):
+        self.requests = TokenBucket(rpm) if rpm > 0 else None
+        self.tokens = TokenBucket(tpm) if tpm > 0 else None
+        self._queues = OrderedDict()
+        self._tickets = itertools.count()
+        self._condition = threading.Condition()
+        self.granted = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def acquire(self, session_id: str, tokens: int):
+        """Block until this session's request may be sent"""
+        self._check_size(tokens)
+        ticket, enqueued = self._enqueue(session_id)
+        try:
+            with self._condition:
+                while True:
+                    wait = self._try_grant(session_id, ticket, tokens, enqueued)
+                    if wait is None:
+                        self._condition.notify_all()
+                        return
+                    self._condition.wait(min(wait, self.MAX_POLL_SECONDS))
+        except BaseException:
+            self._cancel(session_id, ticket)
+            raise
+
+    async def acquire_async(self, session_id: str, tokens: int):
+        """Wait without blocking the event loop until the request may be sent"""
+        self._check_size(tokens)
+        ticket, enqueued = self._enqueue(session_id)
+        try:
+            while True:
+                with self._condition:
+                    wait = self._try_grant(session_id, ticket, tokens, enqueued)
+                    if wait is None:
+                        self._condition.notify_all()
+                        return
+                await asyncio.sleep(min(wait, self.MAX_POLL_SECONDS))
+        except asyncio.CancelledError:
+            self._cancel(session_id, ticket)
+            raise
+
+    def reconcile(self, estimated: int, actual: Optional[int]):
+        """Charge or refund the difference between estimated and actual tokens"""
+        if self.tokens is None or actual is None:
+            return
+        with self._condition:
+            self.tokens.level -= actual - estimated
+            self._condition.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, wait-time and bucket level metrics"""
+        with self._condition:
+            now = time.monotonic()
+            for bucket in (self.requests, self.tokens):
+                if bucket:
+                    bucket.refill(now)
+            return {
+                "queue_depth": sum(len(queue) for queue in self._queues.values()),
+                "queued_sessions": len(self._queues),
+                "granted": self.granted,
+                "wait_seconds_total": round(self.wait_seconds_total, 3),
+                "wait_seconds_avg": round(self.wait_seconds_total / self.granted, 3) if self.granted else 0.0,
+                "wait_seconds_max": round(self.wait_seconds_max, 3),
+                "requests_available": round(self.requests.level, 1) if self.requests else None,
+                "tokens_available": round(self.tokens.level) if self.tokens else None
+            }
+
+    def _check_size(self, tokens: int):
+        """Refuse a request no amount of waiting would make room for"""
+        if self.tokens and tokens > self.tokens.capacity:
+            raise RequestTooLargeError(
+                f"Request needs ~{tokens} tokens but GROQ_TPM_LIMIT is {self.tokens.capacity:.0f} per minute"
+            )
+
+    def _enqueue(self, session_id: str) -> tuple:
+        with self._condition:
+            ticket = next(self._tickets)
+            self._queues.setdefault(session_id, deque()).append(ticket)
+            return ticket, time.monotonic()
+
+    def _cancel(self, session_id: str, ticket: int):
+        with self._condition:
+            queue = self._queues.get(session_id)
+            if queue and ticket in queue:
+                queue.remove(ticket)
+                if not queue:
+                    del self._queues[session_id]
+            self._condition.notify_all()
+
+    def _try_grant(self, session_id: str, ticket: int, tokens: int, enqueued: float) -> Optional[float]:
+        """Grant the ticket if it is next and the budget allows; otherwise the seconds to wait.
+
+        Must be called with the condition held.
+        """
+        # Round robin: the next grant goes to the head of the first queued session
+        head_session, head_queue = next(iter(self._queues.items()))
+        if head_session != session_id or head_queue[0] != ticket:
+            return self.MAX_POLL_SECONDS
+
+        now = time.monotonic()
+        wait = 0.0
+        if self.requests:
+            self.requests.refill(now)
+            wait = max(wait, self.requests.wait_time(1))
+        if self.tokens:
+            self.tokens.refill(now)
+            wait = max(wait, self.tokens.wait_time(tokens))
+        if wait > 0:
+            return wait
+
+        if self.requests:
+            self.requests.take(1)
+        if self.tokens:
+            self.tokens.take(tokens)
+
+        head_queue.popleft()
+        del self._queues[session_id]
+        if head_queue:
+            # Requeue the session behind the others that are waiting
+            self._queues[session_id] = head_queue
+
+        waited = now - enqueued
+        self.granted += 1
+        self.wait_seconds_total += waited
+        self.wait_seconds_max = max(self.wait_seconds_max, waited)
+        if waited >= 1:
+            logging.info(f"Groq request for session {session_id} waited {waited:.1f}s for rate limit budget")
+        return None
+
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+
+def get_scheduler(api_key: str, model: str) -> RequestScheduler:
+    """Process-wide scheduler for one API key and model, shared by every agent"""
+    with _schedulers_lock:
+        scheduler = _schedulers.get((api_key, model))
+        if scheduler is None:
+            scheduler = _schedulers[(api_key, model)] = RequestScheduler()
+        return scheduler
+
+def scheduler_stats() -> Dict[str, Dict[str, Any]]:
+    """Metrics for every scheduler in the process, keyed by model"""
+    with _schedulers_lock:
+        schedulers = list(_schedulers.items())
+    stats = {}
+    for (_, model), scheduler in schedulers:
+        stats[model] = scheduler.stats()
+    return stats
+
+def estimate_request_tokens(messages: List[Dict[str, Any]], tools: Optional[List[Dict]] = None) -> int:
+    """Estimate the prompt tokens a completions request will be charged for"""
+    tokens = estimate_tokens(messages)
+    if tools:
+        tokens += len(dumps(tools)) // CHARS_PER_TOKEN
+    return tokens
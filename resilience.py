@@ -0,0 +1,243 @@
+import asyncio
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, List, Optional
+from config import Config
+from ratelimit import RequestTooLargeError, get_scheduler, estimate_request_tokens
+import logging
+
+# Import Groq error types with fallback for older SDK versions
+try:
+    from groq import APIConnectionError, APITimeoutError
+except ImportError:
+    APIConnectionError = APITimeoutError = ConnectionError
+
+# Status codes worth retrying: timeouts, conflicts, rate limits and server errors
+RETRYABLE_STATUS = {408, 409, 429}
+
+class CircuitOpenError(Exception):
+    """Raised when every candidate model has an open circuit breaker"""
+
+class CircuitBreaker:
+    """Per-model circuit breaker.
+
+    After failure_threshold consecutive failures the breaker opens and calls
+    are refused for reset_seconds. The first call after that is a half-open
+    probe: success closes the breaker, failure opens it again. A probe that
+    is cancelled, or never reports back within reset_seconds, lets the next
+    call probe instead.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = Config.BREAKER_FAILURE_THRESHOLD,
+                 reset_seconds: float = Config.BREAKER_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_started = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """True if a call may be made now"""
+        with self._lock:
+            now = time.monotonic()
+            if (self.state == self.OPEN and now - self.opened_at >= self.reset_seconds) or \
+                    (self.state == self.HALF_OPEN and now - self.probe_started >= self.reset_seconds):
+                # Let a single probe through
+                self.state = self.HALF_OPEN
+                self.probe_started = now
+                return True
+            return self.state == self.CLOSED
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def release_probe(self):
+        """Give up a probe that ended without a result, so the next call probes"""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.OPEN
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+def get_breaker(model: str) -> CircuitBreaker:
+    """Process-wide breaker for one model, shared by every agent"""
+    with _breakers_lock:
+        breaker = _breakers.get(model)
+        if breaker is None:
+            breaker = _breakers[model] = CircuitBreaker()
+        return breaker
+
+def is_retryable(error: Exception) -> bool:
+    """True for rate limits, transient server errors and connection failures"""
+    if isinstance(error, (APIConnectionError, APITimeoutError)):
+        return True
+    status = getattr(error, "status_code", None)
+    return status in RETRYABLE_STATUS or (status is not None and status >= 500)
+
+def retry_after(error: Exception) -> Optional[float]:
+    """Seconds to wait from the Retry-After headers of an API error, if any"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def backoff_delay(attempt: int) -> float:
+    """Exponential backoff with full jitter for the given retry attempt"""
+    return random.uniform(0, min(Config.GROQ_BACKOFF_MAX, Config.GROQ_BACKOFF_BASE * 2 ** attempt))
+
+class ResilientCompletions:
+    """Wraps client.chat.completions.create with retries, breakers and fallback.
+
+    Retryable errors are retried with jittered backoff (honouring Retry-After)
+    up to GROQ_MAX_RETRIES times. When a model's breaker is open, or its
+    retries run out, the call falls back to Config.MODELS["fast"]. For
+    streaming calls only opening the stream is retried.
+
+    Every attempt first waits for the shared rate limit budget of its model
+    (see ratelimit.RequestScheduler), queued fairly by session_id.
+    """
+
+    def __init__(self, client: Any, session_id: str = "default"):
+        self.client = client
+        self.session_id = session_id
+
+    def create(self, model: str, **kwargs) -> Any:
+        last_error = None
+        for candidate in self._candidates(model):
+            breaker = get_breaker(candidate)
+            for attempt in range(Config.GROQ_MAX_RETRIES + 1):
+                if not breaker.allow():
+                    logging.warning(f"Circuit open for Groq {candidate}")
+                    break
+                scheduler = get_scheduler(self.client.api_key, candidate)
+                estimate = estimate_request_tokens(kwargs.get("messages", []), kwargs.get("tools"))
+                try:
+                    scheduler.acquire(self.session_id, estimate)
+                    response = self.client.chat.completions.create(model=candidate, **kwargs)
+                    breaker.record_success()
+                    scheduler.reconcile(estimate, self._total_tokens(response))
+                    return response
+                except RequestTooLargeError:
+                    # Rejected before it was sent - no verdict on the model
+                    breaker.release_probe()
+                    raise
+                except Exception as e:
+                    last_error = e
+                    delay = self._after_failure(breaker, candidate, e, attempt)
+                    if delay is None:
+                        break
+                    time.sleep(delay)
+                except BaseException:
+                    # Cancelled or interrupted - no verdict on the model
+                    breaker.release_probe()
+                    raise
+        raise last_error or CircuitOpenError(f"Circuit open for {model}")
+
+    @staticmethod
+    def _total_tokens(response: Any) -> Optional[int]:
+        """Tokens charged for a completed call; None for streams"""
+        return getattr(getattr(response, "usage", None), "total_tokens", None)
+
+    @staticmethod
+    def _candidates(model: str) -> List[str]:
+        """The requested model followed by the fast fallback"""
+        fallback = Config.MODELS["fast"]
+        return [model] if model == fallback else [model, fallback]
+
+    @staticmethod
+    def _after_failure(breaker: CircuitBreaker, model: str, error: Exception, attempt: int) -> Optional[float]:
+        """Record a failed call and return the delay before retrying, or None to move on"""
+        if not is_retryable(error):
+            # Bad requests are the caller's fault - the model answered, so
+            # count it as healthy and surface the error
+            breaker.record_success()
+            raise error
+
+        breaker.record_failure()
+        if breaker.state == CircuitBreaker.OPEN:
+            logging.warning(f"Circuit opened for Groq {model}: {error}")
+            return None
+        if attempt >= Config.GROQ_MAX_RETRIES:
+            logging.warning(f"Groq {model} failed after {attempt + 1} attempts: {error}")
+            return None
+
+        delay = retry_after(error)
+        if delay is None:
+            delay = backoff_delay(attempt)
+        elif delay > Config.GROQ_RETRY_MAX_WAIT:
+            # Waiting that long would stall the turn - try the fallback instead
+            logging.warning(f"Groq {model} asked to retry after {delay:.1f}s, falling back")
+            return None
+
+        logging.warning(f"Groq {model} error ({error}), retry {attempt + 1} in {delay:.2f}s")
+        return delay
+
+class AsyncResilientCompletions(ResilientCompletions):
+    """ResilientCompletions for AsyncGroq clients"""
+
+    async def create(self, model: str, **kwargs) -> Any:
+        last_error = None
+        for candidate in self._candidates(model):
+            breaker = get_breaker(candidate)
+            for attempt in range(Config.GROQ_MAX_RETRIES + 1):
+                if not breaker.allow():
+                    logging.warning(f"Circuit open for Groq {candidate}")
+                    break
+                scheduler = get_scheduler(self.client.api_key, candidate)
+                estimate = estimate_request_tokens(kwargs.get("messages", []), kwargs.get("tools"))
+                try:
+                    await scheduler.acquire_async(self.session_id, estimate)
+                    response = await self.client.chat.completions.create(model=candidate, **kwargs)
+                    breaker.record_success()
+                    scheduler.reconcile(estimate, self._total_tokens(response))
+                    return response
+                except RequestTooLargeError:
+                    # Rejected before it was sent - no verdict on the model
+                    breaker.release_probe()
+                    raise
+                except Exception as e:
+                    last_error = e
+                    delay = self._after_failure(breaker, candidate, e, attempt)
+                    if delay is None:
+                        break
+                    await asyncio.sleep(delay)
+                except BaseException:
+                    # Cancelled or interrupted - no verdict on the model
+                    breaker.release_probe()
+                    raise
+        raise last_error or CircuitOpenError(f"Circuit open for {model}")
@@ -0,0 +1,78 @@
+import re
+from typing import Sequence
+from config import Config
+
+class ModelRouter:
+    """Routing policy choosing a Config.MODELS tier for each completions call.
+
+    Subclass and override select_tier to plug in a different policy.
+    """
+
+    def select_tier(self, user_message: str, step: int, use_tools: bool,
+                    previous_tools: Sequence[str] = ()) -> str:
+        """Return the model tier for one step of a turn.
+
+        previous_tools names the tools called by the turn's previous step.
+        """
+        return "primary"
+
+class RuleBasedRouter(ModelRouter):
+    """Sends lookups, and answers that only report what read-only tools
+    returned, to the fast model.
+
+    Planning, coaching and anything unrecognised stay on the primary model,
+    as does the forced final answer of a turn that ran out of steps or time.
+    """
+
+    # Tools that only read data - a step after these reports, it doesn't plan
+    READ_ONLY_TOOLS = frozenset({"get_goals", "get_goal_details", "get_progress_logs", "get_analytics"})
+
+    # Short requests that only read and report data
+    LOOKUP_PATTERN = re.compile(
+        r"\b(show|list|view|see|display|what are|get)\b.*\b(goals?|milestones?|progress|analytics|stats|statistics)\b"
+        r"|\b(analytics|stats|statistics)\b",
+        re.IGNORECASE
+    )
+
+    # Requests that need real reasoning even if they mention lookups
+    PLANNING_PATTERN = re.compile(
+        r"\b(plan|break\s*down|milestones? for|create|help|strategy|struggl|stuck|motivat|why|how (do|can|should))",
+        re.IGNORECASE
+    )
+
+    MAX_LOOKUP_LENGTH = 120
+
+    def select_tier(self, user_message: str, step: int, use_tools: bool,
+                    previous_tools: Sequence[str] = ()) -> str:
+        if self.is_lookup(user_message):
+            return "fast"
+
+        # Withheld tools mean the turn exhausted its steps or deadline - that
+        # answer has to make sense of a long planning loop
+        if not use_tools:
+            return "primary"
+
+        # After read-only tools, a request with no planning intent only needs
+        # the results reported back
+        if step > 0 and previous_tools and set(previous_tools) <= self.READ_ONLY_TOOLS \
+                and not self.PLANNING_PATTERN.search(user_message):
+            return "fast"
+
+        return "primary"
+
+    def is_lookup(self, user_message: str) -> bool:
+        """True for short list/analytics requests with no planning intent"""
+        return (
+            len(user_message) <= self.MAX_LOOKUP_LENGTH
+            and bool(self.LOOKUP_PATTERN.search(user_message))
+            and not self.PLANNING_PATTERN.search(user_message)
+        )
+
+ROUTERS = {
+    "primary": ModelRouter,
+    "rules": RuleBasedRouter
+}
+
+def get_router(name: str = None) -> ModelRouter:
+    """Build the routing policy named in Config.MODEL_ROUTING"""
+    return ROUTERS[name or Config.MODEL_ROUTING]()
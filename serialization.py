@@ -0,0 +1,52 @@
+import json
+from datetime import datetime
+from typing import Any
+from bson.codec_options import CodecOptions, TypeDecoder, TypeRegistry
+
+# Import ObjectId with fallback for different pymongo versions
+try:
+    from bson.objectid import ObjectId
+except ImportError:
+    from pymongo.objectid import ObjectId
+
+# orjson is optional - fall back to the stdlib encoder when it is missing
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+class _ObjectIdDecoder(TypeDecoder):
+    bson_type = ObjectId
+
+    def transform_bson(self, value: ObjectId) -> str:
+        return str(value)
+
+class _DatetimeDecoder(TypeDecoder):
+    bson_type = datetime
+
+    def transform_bson(self, value: datetime) -> str:
+        return value.isoformat()
+
+# Decodes ObjectId and datetime straight to JSON-ready strings while BSON is
+# parsed, at every nesting level, so documents need no post-processing walk
+JSON_CODEC_OPTIONS = CodecOptions(type_registry=TypeRegistry([_ObjectIdDecoder(), _DatetimeDecoder()]))
+
+def _default(value: Any) -> Any:
+    """Encode values the JSON backends do not handle natively"""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dumps(value: Any) -> str:
+    """Compact JSON text, using orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(value, default=_default, option=orjson.OPT_NON_STR_KEYS).decode()
+    return json.dumps(value, default=_default, separators=(",", ":"), ensure_ascii=False)
+
+def loads(text: str) -> Any:
+    """Parse JSON text, using orjson when it is installed"""
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
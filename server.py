@@ -0,0 +1,271 @@
+import asyncio
+import time
+import uuid
+from typing import Dict
+from aiohttp import web, WSMsgType
+from groq import AsyncGroq
+from config import Config
+from async_goal_agent import AsyncGoalAgent
+from goal_agent import SessionOwnerError
+from async_mongodb_database import AsyncGoalMongoDB
+from ratelimit import scheduler_stats
+from metrics import PrometheusSink, get_sink
+from serialization import dumps, loads
+import logging
+
+class Session:
+    """One user's conversation: an agent plus bookkeeping for eviction"""
+
+    def __init__(self, session_id: str, user_id: str, agent: AsyncGoalAgent):
+        self.session_id = session_id
+        self.user_id = user_id
+        self.agent = agent
+        self.last_used = time.monotonic()
+        # Turns within a session run one at a time - they share the history
+        self.lock = asyncio.Lock()
+
+    def touch(self):
+        self.last_used = time.monotonic()
+
+class SessionManager:
+    """Keeps one AsyncGoalAgent per session id and evicts idle sessions.
+
+    Every agent shares one Groq client and one Motor client, so an idle
+    session costs only its conversation history. Evicting a session loses
+    nothing - its history is persisted and reloaded on the next turn.
+    """
+
+    def __init__(self, client: AsyncGroq, db: AsyncGoalMongoDB,
+                 idle_seconds: float = Config.SESSION_IDLE_SECONDS,
+                 max_sessions: int = Config.SERVER_MAX_SESSIONS):
+        self.client = client
+        self.db = db
+        self.idle_seconds = idle_seconds
+        self.max_sessions = max_sessions
+        self.sessions: Dict[str, Session] = {}
+        self.evicted = 0
+
+    async def get(self, session_id: str, user_id: str) -> Session:
+        """The session for session_id, bound to user_id.
+
+        A session not held by this worker is rehydrated from the sessions
+        collection on first use, so any worker can serve any session.
+        """
+        session = self.sessions.get(session_id)
+        if session is None:
+            agent = AsyncGoalAgent(db=self.db, client=self.client,
+                                   session_id=session_id, user_id=user_id)
+            try:
+                await agent.load_session()
+            except SessionOwnerError:
+                raise web.HTTPForbidden(reason="Session belongs to another user")
+
+            # Another request may have loaded the session while this one waited
+            session = self.sessions.get(session_id)
+            if session is None:
+                if len(self.sessions) >= self.max_sessions:
+                    self._evict_oldest()
+                session = self.sessions[session_id] = Session(session_id, user_id, agent)
+
+        if session.user_id != user_id:
+            raise web.HTTPForbidden(reason="Session belongs to another user")
+        session.touch()
+        return session
+
+    async def remove(self, session_id: str, user_id: str):
+        """Forget a conversation here and in the sessions collection"""
+        session = await self.get(session_id, user_id)
+        self.sessions.pop(session_id, None)
+        await session.agent.reset_conversation()
+
+    def evict_idle(self) -> int:
+        """Drop sessions idle for longer than idle_seconds"""
+        cutoff = time.monotonic() - self.idle_seconds
+        idle = [sid for sid, session in self.sessions.items()
+                if session.last_used < cutoff and not session.lock.locked()]
+        for session_id in idle:
+            del self.sessions[session_id]
+        self.evicted += len(idle)
+        return len(idle)
+
+    def _evict_oldest(self):
+        """Make room for a new session by dropping the least recently used idle one"""
+        candidates = [s for s in self.sessions.values() if not s.lock.locked()]
+        if not candidates:
+            raise web.HTTPServiceUnavailable(reason="Too many active sessions")
+        oldest = min(candidates, key=lambda s: s.last_used)
+        del self.sessions[oldest.session_id]
+        self.evicted += 1
+
+    async def sweep(self):
+        """Background task evicting idle sessions"""
+        while True:
+            await asyncio.sleep(Config.SESSION_SWEEP_SECONDS)
+            evicted = self.evict_idle()
+            if evicted:
+                logging.info(f"Evicted {evicted} idle sessions, {len(self.sessions)} active")
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "sessions": len(self.sessions),
+            "busy": sum(1 for s in self.sessions.values() if s.lock.locked()),
+            "evicted": self.evicted
+        }
+
+def _user_id(request: web.Request) -> str:
+    """The caller's user id.
+
+    Only the X-User-Id header set by the authenticating proxy in front of
+    the server is trusted - never anything the client controls, such as
+    the query string. WebSocket clients authenticate to the proxy, which
+    adds the header to the upgrade request.
+    """
+    user_id = request.headers.get("X-User-Id")
+    if not user_id:
+        raise web.HTTPUnauthorized(reason="X-User-Id header is required")
+    return user_id
+
+def _json_response(data: Dict, status: int = 200) -> web.Response:
+    return web.Response(text=dumps(data), status=status, content_type="application/json")
+
+async def _read_message(request: web.Request) -> str:
+    try:
+        body = loads(await request.read())
+        message = body.get("message", "").strip()
+    except (ValueError, AttributeError):
+        raise web.HTTPBadRequest(reason="Body must be JSON with a 'message' field")
+    if not message:
+        raise web.HTTPBadRequest(reason="'message' must not be empty")
+    return message
+
+async def create_session(request: web.Request) -> web.Response:
+    """POST /sessions - allocate a new session id"""
+    sessions: SessionManager = request.app["sessions"]
+    session = await sessions.get(uuid.uuid4().hex, _user_id(request))
+    return _json_response({"session_id": session.session_id}, status=201)
+
+async def post_message(request: web.Request) -> web.StreamResponse:
+    """POST /sessions/{session_id}/messages - one turn, as JSON or an SSE stream"""
+    sessions: SessionManager = request.app["sessions"]
+    session = await sessions.get(request.match_info["session_id"], _user_id(request))
+    message = await _read_message(request)
+
+    if "text/event-stream" not in request.headers.get("Accept", ""):
+        async with session.lock:
+            reply = await session.agent.chat(message)
+        session.touch()
+        return _json_response({"session_id": session.session_id, "reply": reply})
+
+    response = web.StreamResponse(headers={
+        "Content-Type": "text/event-stream",
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+    await response.prepare(request)
+    async with session.lock:
+        # Close the turn before releasing the lock: if the client disconnects
+        # mid-stream, a generator left for the GC would persist this turn
+        # while the next one runs
+        stream = session.agent.chat_stream(message)
+        try:
+            async for delta in stream:
+                await response.write(f"data: {dumps({'delta': delta})}\n\n".encode())
+        finally:
+            await stream.aclose()
+    session.touch()
+    await response.write(b"event: done\ndata: {}\n\n")
+    await response.write_eof()
+    return response
+
+async def websocket(request: web.Request) -> web.WebSocketResponse:
+    """GET /sessions/{session_id}/ws - streamed turns over a WebSocket"""
+    sessions: SessionManager = request.app["sessions"]
+    session_id = request.match_info["session_id"]
+    user_id = _user_id(request)
+    await sessions.get(session_id, user_id)
+
+    ws = web.WebSocketResponse(heartbeat=30)
+    await ws.prepare(request)
+
+    async for msg in ws:
+        if msg.type != WSMsgType.TEXT:
+            continue
+        try:
+            message = loads(msg.data).get("message", "").strip()
+        except (ValueError, AttributeError):
+            message = msg.data.strip()
+        if not message:
+            continue
+
+        # Re-fetch each turn - the session may have been evicted while idle
+        session = await sessions.get(session_id, user_id)
+        async with session.lock:
+            # As in post_message, finish the turn while the lock is held
+            stream = session.agent.chat_stream(message)
+            try:
+                async for delta in stream:
+                    await ws.send_str(dumps({"delta": delta}))
+            finally:
+                await stream.aclose()
+        session.touch()
+        await ws.send_str(dumps({"done": True}))
+
+    return ws
+
+async def delete_session(request: web.Request) -> web.Response:
+    """DELETE /sessions/{session_id} - forget a conversation"""
+    sessions: SessionManager = request.app["sessions"]
+    await sessions.remove(request.match_info["session_id"], _user_id(request))
+    return web.Response(status=204)
+
+async def analytics(request: web.Request) -> web.Response:
+    """GET /analytics - goal analytics for the calling user"""
+    db: AsyncGoalMongoDB = request.app["db"]
+    return _json_response(await db.get_goal_analytics(_user_id(request)))
+
+async def health(request: web.Request) -> web.Response:
+    """GET /health - session counts and rate limiter queues"""
+    return _json_response({
+        "status": "ok",
+        **request.app["sessions"].stats(),
+        "rate_limits": scheduler_stats()
+    })
+
+async def metrics(request: web.Request) -> web.Response:
+    """GET /metrics - turn metrics in Prometheus text format"""
+    sink = get_sink()
+    if not isinstance(sink, PrometheusSink):
+        raise web.HTTPNotFound(reason="Set METRICS_SINK=prometheus to expose metrics")
+    return web.Response(text=sink.render(), content_type="text/plain")
+
+async def _startup(app: web.Application):
+    await app["db"].connect()
+    app["sweeper"] = asyncio.create_task(app["sessions"].sweep())
+
+async def _cleanup(app: web.Application):
+    app["sweeper"].cancel()
+    await app["client"].close()
+    app["db"].close()
+
+def create_app(api_key: str = Config.GROQ_API_KEY) -> web.Application:
+    """Build the aiohttp application with a shared Groq client and database"""
+    app = web.Application()
+    app["client"] = AsyncGroq(api_key=api_key, max_retries=0)
+    app["db"] = AsyncGoalMongoDB()
+    app["sessions"] = SessionManager(app["client"], app["db"])
+
+    app.router.add_post("/sessions", create_session)
+    app.router.add_post("/sessions/{session_id}/messages", post_message)
+    app.router.add_get("/sessions/{session_id}/ws", websocket)
+    app.router.add_delete("/sessions/{session_id}", delete_session)
+    app.router.add_get("/analytics", analytics)
+    app.router.add_get("/health", health)
+    app.router.add_get("/metrics", metrics)
+
+    app.on_startup.append(_startup)
+    app.on_cleanup.append(_cleanup)
+    return app
+
+def run_server(host: str = Config.SERVER_HOST, port: int = Config.SERVER_PORT):
+    """Serve the agent over HTTP until interrupted"""
+    web.run_app(create_app(), host=host, port=port)
@@ -0,0 +1,23 @@
+import os
+import sys
+import uuid
+import pytest
+
+# The modules live at the repository root rather than in a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture
+def db(monkeypatch):
+    """GoalMongoDB on a fresh in-memory database"""
+    pytest.importorskip("mongomock")
+    import mongodb_database
+    from bench import backend
+    from config import Config
+
+    monkeypatch.setattr(mongodb_database, "MongoClient", backend.CountingMongoClient)
+    # mongomock has neither custom type codecs nor explain()
+    monkeypatch.setattr(Config, "BSON_JSON_CODEC", False)
+    monkeypatch.setattr(Config, "CHECK_QUERY_PLANS", False)
+    database = mongodb_database.GoalMongoDB(uri="mongodb://tests", db_name=f"test_{uuid.uuid4().hex}")
+    yield database
+    database.close()
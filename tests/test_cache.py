@@ -0,0 +1,49 @@
+from cache import QueryCache
+
+def test_invalidate_drops_only_tagged_entries():
+    cache = QueryCache()
+    cache.set("alice", ["a"], ["goals:alice"])
+    cache.set("bob", ["b"], ["goals:bob"])
+
+    cache.invalidate("goals:alice")
+
+    assert cache.get("alice") is None
+    assert cache.get("bob") == ["b"]
+
+def test_set_skips_value_read_before_a_write():
+    cache = QueryCache()
+    generation = cache.generation()
+    cache.invalidate("goals:alice")
+
+    cache.set("alice", ["stale"], ["goals:alice"], generation=generation)
+
+    assert cache.get("alice") is None
+
+def test_get_returns_a_copy():
+    cache = QueryCache()
+    cache.set("alice", {"goals": []}, ["goals:alice"])
+    cache.get("alice")["goals"].append("mutated")
+
+    assert cache.get("alice") == {"goals": []}
+
+def test_goal_write_invalidates_cached_list(db):
+    db.create_goal({"title": "Run a marathon", "user_id": "alice"})
+    db.create_goal({"title": "Read 12 books", "user_id": "bob"})
+    assert [g["title"] for g in db.get_goals("alice")] == ["Run a marathon"]
+    db.get_goals("bob")
+    hits = db.cache.stats()["hits"]
+
+    db.create_goal({"title": "Learn Spanish", "user_id": "alice"})
+
+    assert len(db.get_goals("alice")) == 2
+    # Another user's cached list is untouched by the write
+    assert len(db.get_goals("bob")) == 1
+    assert db.cache.stats()["hits"] == hits + 1
+
+def test_goal_update_invalidates_cached_list(db):
+    goal_id = db.create_goal({"title": "Run a marathon", "user_id": "alice"})
+    db.get_goals("alice")
+
+    db.update_goal(goal_id, {"title": "Run a half marathon"}, user_id="alice")
+
+    assert db.get_goals("alice")[0]["title"] == "Run a half marathon"
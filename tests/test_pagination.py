@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta
+import pytest
+from tools import GoalTools
+
+def seed_goals(db, count, user_id="alice"):
+    """Goals with repeated priorities and creation times, so ties go to _id"""
+    created = datetime(2024, 1, 1)
+    db.goals.insert_many([
+        {"user_id": user_id, "title": f"Goal {i}", "status": "active", "priority": i % 3 + 1,
+         "created_date": created + timedelta(days=i % 4)}
+        for i in range(count)
+    ])
+
+def test_goal_pages_return_every_goal_once(db):
+    seed_goals(db, 23)
+    seed_goals(db, 5, user_id="bob")
+
+    titles, cursor, pages = [], None, 0
+    while True:
+        page = db.get_goals_page("alice", page_size=5, cursor=cursor)
+        titles.extend(goal["title"] for goal in page["goals"])
+        pages += 1
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert pages == 5
+    assert len(titles) == len(set(titles)) == 23
+    assert titles == [goal["title"] for goal in db.get_goals("alice")]
+
+def test_exact_multiple_of_page_size_has_no_empty_page(db):
+    seed_goals(db, 10)
+
+    first = db.get_goals_page("alice", page_size=5)
+    second = db.get_goals_page("alice", page_size=5, cursor=first["next_cursor"])
+
+    assert len(second["goals"]) == 5
+    assert second["next_cursor"] is None
+
+def test_progress_log_pages_return_every_log_once(db):
+    goal_id = db.create_goal({"title": "Run a marathon", "user_id": "alice"})
+    for i in range(12):
+        db.log_progress(goal_id, "update", f"Run {i}")
+
+    contents, cursor = [], None
+    while True:
+        page = db.get_progress_logs_page(goal_id, page_size=5, cursor=cursor)
+        contents.extend(log["content"] for log in page["logs"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert sorted(contents) == sorted(f"Run {i}" for i in range(12))
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", "eyJfaWQiOiAieCJ9"])
+def test_bad_cursor_is_rejected(db, cursor):
+    seed_goals(db, 3)
+
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        db.get_goals_page("alice", page_size=2, cursor=cursor)
+
+def test_tool_reports_bad_cursor(db):
+    tools = GoalTools.__new__(GoalTools)
+    tools.db = db
+
+    result = tools.get_goals_function(user_id="alice", cursor="not-a-cursor")
+
+    assert result["success"] is False
+    assert "Invalid cursor" in result["error"]
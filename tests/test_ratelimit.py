@@ -0,0 +1,102 @@
+import asyncio
+import pytest
+import ratelimit
+from ratelimit import RequestScheduler, RequestTooLargeError
+
+class Clock:
+    """Fake monotonic clock advanced by the scheduler's own sleeps"""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = 0.0
+
+    def monotonic(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        # A real clock always moves on; rounding can leave a wait too small
+        # to change a float this size
+        seconds = max(seconds, 0.001)
+        self.now += seconds
+        self.slept += seconds
+        # Let the other queued callers run
+        await real_sleep(0)
+
+real_sleep = asyncio.sleep
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(ratelimit, "time", clock)
+    monkeypatch.setattr(ratelimit, "asyncio", clock)
+    return clock
+
+def acquire(scheduler, session_id, tokens=10):
+    asyncio.run(scheduler.acquire_async(session_id, tokens))
+
+def test_rpm_limit_delays_request_beyond_budget(clock):
+    scheduler = RequestScheduler(rpm=3, tpm=0)
+    for _ in range(3):
+        acquire(scheduler, "s1")
+    assert clock.slept == 0
+
+    acquire(scheduler, "s1")
+
+    # One request refills every 60 / 3 seconds
+    assert clock.slept == pytest.approx(20, abs=RequestScheduler.MAX_POLL_SECONDS)
+    assert scheduler.stats()["granted"] == 4
+
+def test_tpm_limit_delays_request_beyond_budget(clock):
+    scheduler = RequestScheduler(rpm=0, tpm=600)
+    acquire(scheduler, "s1", tokens=500)
+    assert clock.slept == 0
+
+    acquire(scheduler, "s1", tokens=300)
+
+    # 200 tokens short at 10 tokens a second
+    assert clock.slept == pytest.approx(20, abs=RequestScheduler.MAX_POLL_SECONDS)
+
+def test_reconcile_charges_actual_usage(clock):
+    scheduler = RequestScheduler(rpm=0, tpm=600)
+    acquire(scheduler, "s1", tokens=100)
+
+    scheduler.reconcile(estimated=100, actual=600)
+    acquire(scheduler, "s1", tokens=100)
+
+    assert clock.slept == pytest.approx(10, abs=RequestScheduler.MAX_POLL_SECONDS)
+
+def test_sessions_are_served_round_robin(clock):
+    scheduler = RequestScheduler(rpm=1, tpm=0)
+    acquire(scheduler, "warmup")
+    order = []
+
+    async def request(session_id, label):
+        await scheduler.acquire_async(session_id, 10)
+        order.append(label)
+
+    async def run():
+        # One busy session queues three requests ahead of two others
+        await asyncio.gather(
+            request("busy", "busy-1"), request("busy", "busy-2"), request("busy", "busy-3"),
+            request("quiet", "quiet-1"), request("other", "other-1")
+        )
+
+    asyncio.run(run())
+
+    assert order == ["busy-1", "quiet-1", "other-1", "busy-2", "busy-3"]
+    assert scheduler.stats()["queue_depth"] == 0
+
+def test_request_larger_than_tpm_is_rejected(clock):
+    scheduler = RequestScheduler(rpm=0, tpm=600)
+
+    with pytest.raises(RequestTooLargeError):
+        acquire(scheduler, "s1", tokens=601)
+
+    assert scheduler.stats()["queue_depth"] == 0
+    assert scheduler.stats()["granted"] == 0
+
+def test_request_too_large_is_rejected_synchronously():
+    scheduler = RequestScheduler(rpm=0, tpm=600)
+
+    with pytest.raises(RequestTooLargeError):
+        scheduler.acquire("s1", 601)
@@ -0,0 +1,156 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+import resilience
+from config import Config
+from ratelimit import RequestScheduler, RequestTooLargeError
+from resilience import AsyncResilientCompletions, CircuitBreaker, ResilientCompletions
+
+class Clock:
+    """Stand-in for time.monotonic that only moves when told to"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(resilience, "time", clock)
+    return clock
+
+@pytest.fixture
+def breakers(monkeypatch):
+    """Fresh process-wide breakers, with rate limiting turned off"""
+    monkeypatch.setattr(resilience, "_breakers", {})
+    monkeypatch.setattr(resilience, "get_scheduler", lambda api_key, model: RequestScheduler(rpm=0, tpm=0))
+    return resilience._breakers
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+
+def open_breaker(clock, reset_seconds=30):
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=reset_seconds)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    return breaker
+
+def test_breaker_opens_after_threshold(clock):
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=30)
+    breaker.record_failure()
+    assert breaker.allow()
+
+    breaker.record_failure()
+
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+def test_breaker_half_open_probe_success_closes(clock):
+    breaker = open_breaker(clock)
+    clock.now += 30
+
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # Only one probe at a time
+    assert not breaker.allow()
+
+    breaker.record_success()
+
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
+
+def test_breaker_half_open_probe_failure_reopens(clock):
+    breaker = open_breaker(clock)
+    clock.now += 30
+    assert breaker.allow()
+
+    breaker.record_failure()
+
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+    clock.now += 30
+    assert breaker.allow()
+
+def test_released_probe_lets_next_call_probe(clock):
+    breaker = open_breaker(clock)
+    clock.now += 30
+    assert breaker.allow()
+
+    breaker.release_probe()
+
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.allow()
+
+def test_abandoned_probe_expires(clock):
+    breaker = open_breaker(clock)
+    clock.now += 30
+    assert breaker.allow()
+
+    clock.now += 30
+
+    assert breaker.allow()
+
+def fake_client(create):
+    return SimpleNamespace(api_key="test", chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+def test_request_too_large_releases_probe(clock, breakers, monkeypatch):
+    model = Config.MODELS["fast"]
+    breaker = breakers[model] = open_breaker(clock)
+    clock.now += 30
+    calls = []
+
+    def acquire(self, session_id, tokens):
+        raise RequestTooLargeError("too large")
+    monkeypatch.setattr(RequestScheduler, "acquire", acquire)
+    completions = ResilientCompletions(fake_client(lambda **kwargs: calls.append(kwargs)))
+
+    with pytest.raises(RequestTooLargeError):
+        completions.create(model, messages=[])
+
+    assert calls == []
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.allow()
+
+def test_cancelled_call_releases_probe(clock, breakers):
+    model = Config.MODELS["fast"]
+    breaker = breakers[model] = open_breaker(clock)
+    clock.now += 30
+
+    async def create(**kwargs):
+        await asyncio.sleep(10)
+
+    async def run():
+        task = asyncio.ensure_future(AsyncResilientCompletions(fake_client(create)).create(model, messages=[]))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run())
+
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.allow()
+
+def test_failed_probe_falls_back_to_fast_model(clock, breakers, monkeypatch):
+    monkeypatch.setattr(Config, "GROQ_MAX_RETRIES", 0)
+    model = Config.MODELS["primary"]
+    breaker = breakers[model] = open_breaker(clock)
+    clock.now += 30
+    calls = []
+
+    def create(model, **kwargs):
+        calls.append(model)
+        if model != Config.MODELS["fast"]:
+            raise StatusError(503)
+        return SimpleNamespace(usage=None)
+
+    ResilientCompletions(fake_client(create)).create(model, messages=[])
+
+    assert calls == [model, Config.MODELS["fast"]]
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
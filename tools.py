@@ -1,6 +1,7 @@
 import json
 from typing import Dict, List, Any
 from mongodb_database import GoalMongoDB
+from config import Config
 from datetime import datetime, timedelta
 import logging
 
@@ -12,20 +13,7 @@ class GoalTools:
                            priority: int = 3, target_date: str = "", user_id: str = "default") -> Dict:
         """Create a new goal with SMART criteria validation"""
         try:
-            goal_data = {
-                'user_id': user_id,
-                'title': title,
-                'description': description,
-                'category': category,
-                'priority': min(max(priority, 1), 5),  # Ensure priority is 1-5
-                'target_date': target_date,
-                'metadata': {
-                    'created_by': 'goal_agent',
-                    'smart_validated': True,
-                    'version': '1.0'
-                }
-            }
-            
+            goal_data = self._goal_data(user_id, title, description, category, priority, target_date)
             goal_id = self.db.create_goal(goal_data)
             return {
                 "success": True, 
@@ -37,53 +25,61 @@ class GoalTools:
             logging.error(f"Error creating goal: {e}")
             return {"success": False, "error": str(e)}
     
-    def get_goals_function(self, user_id: str = "default", status: str = "active", 
-                          limit: int = None) -> Dict:
-        """Retrieve user's goals"""
+    def create_goals_bulk_function(self, goals: List[Dict], user_id: str = "default") -> Dict:
+        """Create several goals in one call"""
         try:
-            goals = self.db.get_goals(user_id, status, limit)
-            return {
-                "success": True,
-                "goals": goals,
-                "count": len(goals)
-            }
+            goals_data, indexes, errors = self._bulk_items(goals, lambda goal: self._goal_item(goal, user_id))
+            results = self.db.create_goals_bulk(goals_data)
+            return self._bulk_response(self._merge_bulk_results(results, indexes, errors), "goals")
+        
+        except Exception as e:
+            logging.error(f"Error creating goals: {e}")
+            return {"success": False, "error": str(e)}
+    
+    def get_goals_function(self, user_id: str = "default", status: str = "active",
+                           limit: int = None, view: str = "summary", cursor: str = None) -> Dict:
+        """Retrieve one page of the user's goals - "summary" view unless details are requested"""
+        try:
+            if view not in ("summary", "detail"):
+                view = "summary"
+            page_size = self._page_size(limit, Config.GOALS_PAGE_SIZE)
+            page = self.db.get_goals_page(user_id, status, page_size, cursor, view)
+            return self._page_response(page, "goals")
         except Exception as e:
             logging.error(f"Error retrieving goals: {e}")
             return {"success": False, "error": str(e)}
     
-    def get_goal_details_function(self, goal_id: str) -> Dict:
+    def get_goal_details_function(self, goal_id: str, user_id: str = "default") -> Dict:
         """Get detailed information about a specific goal"""
         try:
-            goal = self.db.get_goal_by_id(goal_id)
-            if not goal:
+            details = self.db.get_goal_details(goal_id, log_limit=10, user_id=user_id)
+            if not details:
                 return {"success": False, "message": "Goal not found"}
             
-            milestones = self.db.get_milestones(goal_id)
-            progress_logs = self.db.get_progress_logs(goal_id, limit=10)
-            
-            return {
-                "success": True,
-                "goal": goal,
-                "milestones": milestones,
-                "recent_progress": progress_logs
-            }
+            return {"success": True, **details}
         except Exception as e:
             logging.error(f"Error getting goal details: {e}")
             return {"success": False, "error": str(e)}
     
+    def get_progress_logs_function(self, goal_id: str, limit: int = None, cursor: str = None,
+                                   user_id: str = "default") -> Dict:
+        """Retrieve one page of a goal's progress logs, newest first"""
+        try:
+            page = self.db.get_progress_logs_page(
+                goal_id, self._page_size(limit, Config.PROGRESS_PAGE_SIZE), cursor, user_id
+            )
+            return self._page_response(page, "logs")
+        except Exception as e:
+            logging.error(f"Error retrieving progress logs: {e}")
+            return {"success": False, "error": str(e)}
+    
     def add_milestone_function(self, goal_id: str, milestone_title: str, 
                              milestone_description: str = "", due_date: str = "", 
-                             priority: int = 3) -> Dict:
+                             priority: int = 3, user_id: str = "default") -> Dict:
         """Add a milestone to a goal"""
         try:
-            milestone_data = {
-                'title': milestone_title,
-                'description': milestone_description,
-                'due_date': due_date,
-                'priority': priority
-            }
-            
-            milestone_id = self.db.add_milestone(goal_id, milestone_data)
+            milestone_data = self._milestone_data(milestone_title, milestone_description, due_date, priority)
+            milestone_id = self.db.add_milestone(goal_id, milestone_data, user_id)
             return {
                 "success": True, 
                 "milestone_id": milestone_id,
@@ -94,11 +90,23 @@ class GoalTools:
             logging.error(f"Error adding milestone: {e}")
             return {"success": False, "error": str(e)}
     
+    def add_milestones_bulk_function(self, goal_id: str, milestones: List[Dict],
+                                     user_id: str = "default") -> Dict:
+        """Add a whole milestone plan to a goal in one call"""
+        try:
+            milestones_data, indexes, errors = self._bulk_items(milestones, self._milestone_item)
+            results = self.db.add_milestones_bulk(goal_id, milestones_data, user_id)
+            return self._bulk_response(self._merge_bulk_results(results, indexes, errors), "milestones")
+        
+        except Exception as e:
+            logging.error(f"Error adding milestones: {e}")
+            return {"success": False, "error": str(e)}
+    
     def log_progress_function(self, goal_id: str, progress_type: str, content: str, 
-                            metadata: Dict = None) -> Dict:
+                            metadata: Dict = None, user_id: str = "default") -> Dict:
         """Log progress for a goal"""
         try:
-            log_id = self.db.log_progress(goal_id, progress_type, content, metadata or {})
+            log_id = self.db.log_progress(goal_id, progress_type, content, metadata or {}, user_id)
             return {
                 "success": True, 
                 "log_id": log_id,
@@ -108,13 +116,10 @@ class GoalTools:
             logging.error(f"Error logging progress: {e}")
             return {"success": False, "error": str(e)}
     
-    def update_goal_function(self, goal_id: str, **update_fields) -> Dict:
+    def update_goal_function(self, goal_id: str, user_id: str = "default", **update_fields) -> Dict:
         """Update goal fields"""
         try:
-            # Filter out None values and empty strings
-            update_data = {k: v for k, v in update_fields.items() if v is not None and v != ""}
-            
-            success = self.db.update_goal(goal_id, update_data)
+            success = self.db.update_goal(goal_id, self._update_data(update_fields), user_id)
             if success:
                 return {"success": True, "message": "Goal updated successfully"}
             else:
@@ -133,6 +138,131 @@ class GoalTools:
             logging.error(f"Error getting analytics: {e}")
             return {"success": False, "error": str(e)}
 
+    # Argument and response builders, shared with AsyncGoalTools
+    
+    @staticmethod
+    def _goal_data(user_id: str, title: str, description: str = "", category: str = "personal",
+                   priority: int = 3, target_date: str = "") -> Dict:
+        """Goal fields for the database from the tool arguments"""
+        return {
+            'user_id': user_id,
+            'title': title,
+            'description': description,
+            'category': category,
+            'priority': min(max(priority, 1), 5),  # Ensure priority is 1-5
+            'target_date': target_date,
+            'metadata': {
+                'created_by': 'goal_agent',
+                'smart_validated': True,
+                'version': '1.0'
+            }
+        }
+    
+    @staticmethod
+    def _goal_item(goal: Any, user_id: str) -> Dict:
+        """Goal fields for one create_goals_bulk item, raising ValueError if it is invalid"""
+        GoalTools._check_item(goal)
+        return GoalTools._goal_data(user_id, goal['title'], goal.get('description', ''),
+                                    goal.get('category', 'personal'),
+                                    GoalTools._priority(goal.get('priority', 3)),
+                                    goal.get('target_date', ''))
+    
+    @staticmethod
+    def _milestone_data(title: str, description: str = "", due_date: str = "", priority: int = 3) -> Dict:
+        """Milestone fields for the database from the tool arguments"""
+        return {
+            'title': title,
+            'description': description,
+            'due_date': due_date,
+            'priority': priority
+        }
+    
+    @staticmethod
+    def _milestone_item(milestone: Any) -> Dict:
+        """Milestone fields for one add_milestones_bulk item, raising ValueError if it is invalid"""
+        GoalTools._check_item(milestone)
+        return GoalTools._milestone_data(milestone['title'], milestone.get('description', ''),
+                                         milestone.get('due_date', ''),
+                                         GoalTools._priority(milestone.get('priority', 3)))
+    
+    @staticmethod
+    def _check_item(item: Any):
+        """Reject bulk items that are not objects with a title"""
+        if not isinstance(item, dict):
+            raise ValueError(f"expected an object, got {type(item).__name__}")
+        if not item.get('title') or not isinstance(item['title'], str):
+            raise ValueError("title is required")
+    
+    @staticmethod
+    def _priority(value: Any) -> int:
+        """A 1-5 priority from model input, which may be a numeric string or null"""
+        if value is None:
+            return 3
+        try:
+            return min(max(int(value), 1), 5)
+        except (TypeError, ValueError):
+            raise ValueError(f"priority must be an integer from 1 to 5, got {value!r}")
+    
+    @staticmethod
+    def _bulk_items(items: Any, build) -> tuple:
+        """Build the valid bulk items, with their input indexes and an error result for each invalid one"""
+        if not isinstance(items, list):
+            raise ValueError("expected a list of items")
+        
+        data, indexes, errors = [], [], []
+        for index, item in enumerate(items):
+            try:
+                data.append(build(item))
+                indexes.append(index)
+            except ValueError as e:
+                errors.append({"index": index, "error": f"Invalid item: {e}"})
+        return data, indexes, errors
+    
+    @staticmethod
+    def _merge_bulk_results(results: List[Dict], indexes: List[int], errors: List[Dict]) -> List[Dict]:
+        """Database results re-indexed to the input items, merged with the validation errors"""
+        for result in results:
+            result["index"] = indexes[result["index"]]
+        return sorted(results + errors, key=lambda result: result["index"])
+    
+    @staticmethod
+    def _update_data(update_fields: Dict) -> Dict:
+        """The update_goal fields that were actually given"""
+        # Filter out None values and empty strings
+        return {k: v for k, v in update_fields.items() if v is not None and v != ""}
+    
+    @staticmethod
+    def _page_size(limit: Any, default: int) -> int:
+        """The requested page size, or default, capped at MAX_PAGE_SIZE"""
+        try:
+            size = int(limit) if limit else default
+        except (TypeError, ValueError):
+            size = default
+        return min(max(size, 1), Config.MAX_PAGE_SIZE)
+    
+    @staticmethod
+    def _page_response(page: Dict, items_key: str) -> Dict:
+        """A tool result for one page of goals or logs"""
+        return {
+            "success": True,
+            items_key: page[items_key],
+            "count": len(page[items_key]),
+            "next_cursor": page["next_cursor"]
+        }
+    
+    @staticmethod
+    def _bulk_response(results: List[Dict], noun: str) -> Dict:
+        """Summarise per-item bulk insert results for the model"""
+        created = [r for r in results if "id" in r]
+        failed = [r for r in results if "error" in r]
+        return {
+            "success": bool(created),
+            "created": len(created),
+            "failed": len(failed),
+            "results": results,
+            "message": f"Created {len(created)} of {len(results)} {noun}"
+        }
+
 # Tool definitions for Groq API
 GOAL_TOOLS = [
     {
@@ -153,16 +283,48 @@ GOAL_TOOLS = [
             }
         }
     },
+    {
+        "type": "function",
+        "function": {
+            "name": "create_goals_bulk",
+            "description": "Create several goals at once. Prefer this over repeated create_goal calls",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "goals": {
+                        "type": "array",
+                        "description": "Goals to create",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "title": {"type": "string", "description": "The goal title"},
+                                "description": {"type": "string", "description": "Detailed goal description"},
+                                "category": {"type": "string", "description": "Goal category (personal, professional, health, etc.)"},
+                                "priority": {"type": "integer", "description": "Priority level 1-5 (5 = highest)", "minimum": 1, "maximum": 5},
+                                "target_date": {"type": "string", "description": "Target completion date (YYYY-MM-DD)"}
+                            },
+                            "required": ["title"]
+                        }
+                    }
+                },
+                "required": ["goals"]
+            }
+        }
+    },
     {
         "type": "function", 
         "function": {
             "name": "get_goals",
-            "description": "Retrieve user's goals with optional filtering",
+            "description": "Retrieve one page of the user's goals with optional filtering; pass next_cursor back to get more",
             "parameters": {
                 "type": "object",
                 "properties": {
                     "status": {"type": "string", "description": "Goal status filter (active, completed, paused, all)"},
-                    "limit": {"type": "integer", "description": "Maximum number of goals to return"}
+                    "limit": {"type": "integer", "description": "Page size - number of goals to return",
+                              "minimum": 1, "maximum": Config.MAX_PAGE_SIZE},
+                    "view": {"type": "string", "enum": ["summary", "detail"],
+                             "description": "'summary' (default) returns title, status, priority, category and dates; 'detail' adds descriptions and timestamps"},
+                    "cursor": {"type": "string", "description": "next_cursor from a previous get_goals call, to fetch the following page"}
                 }
             }
         }
@@ -181,6 +343,23 @@ GOAL_TOOLS = [
             }
         }
     },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_progress_logs",
+            "description": "Get a goal's progress log history, newest first, one page at a time",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "goal_id": {"type": "string", "description": "The goal ID"},
+                    "limit": {"type": "integer", "description": "Page size - number of logs to return",
+                              "minimum": 1, "maximum": Config.MAX_PAGE_SIZE},
+                    "cursor": {"type": "string", "description": "next_cursor from a previous get_progress_logs call, to fetch the following page"}
+                },
+                "required": ["goal_id"]
+            }
+        }
+    },
     {
         "type": "function",
         "function": {
@@ -199,6 +378,34 @@ GOAL_TOOLS = [
             }
         }
     },
+    {
+        "type": "function",
+        "function": {
+            "name": "add_milestones_bulk",
+            "description": "Add a whole milestone plan to an existing goal in one call. Prefer this over repeated add_milestone calls",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "goal_id": {"type": "string", "description": "The goal ID"},
+                    "milestones": {
+                        "type": "array",
+                        "description": "Milestones to add, in order",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "title": {"type": "string", "description": "Milestone title"},
+                                "description": {"type": "string", "description": "Milestone description"},
+                                "due_date": {"type": "string", "description": "Milestone due date (YYYY-MM-DD)"},
+                                "priority": {"type": "integer", "description": "Milestone priority 1-5"}
+                            },
+                            "required": ["title"]
+                        }
+                    }
+                },
+                "required": ["goal_id", "milestones"]
+            }
+        }
+    },
     {
         "type": "function",
         "function": {